@@ -10,9 +10,22 @@ Functions to load and manage various meteor file formats
 
 """
 
-from .ftpDetectInfo import filterFTPforSpecificTime, writeNewFTPFile, loadFTPDetectInfo, MeteorObservation
-from .imoWorkingShowerList import IMOshowerList, majorlist, minorlist
-from .platepar import loadPlatepars, platepar
-from .UFOAnalyzerXML import UAXml
-from .UFOCapXML import UCXml
-from .kmlHandlers import trackCsvtoKML, trackKMLtoCsv, getTrackDetails, readCameraKML
+try:
+    from ..utils.lazyImport import lazyPackage
+except Exception:
+    from meteortools.utils.lazyImport import lazyPackage
+
+# the submodules are only imported when one of their functions is first used, so importing the
+# package does not load libraries that are not needed
+_submodules = {
+    'ftpDetectInfo': ['filterFTPforSpecificTime', 'writeNewFTPFile', 'loadFTPDetectInfo', 'MeteorObservation',
+        'CompactMeteorObservation', 'loadFTPDetectTable', 'MeteorTable', 'iterFTPDetectInfo', 'FTPDetectIndex',
+        'loadFTPDetectTree', 'writeFTPDetectFile', 'filterFTPforSpecificTimes', 'StationLocations', 'stationLocations'],
+    'imoWorkingShowerList': ['IMOshowerList', 'majorlist', 'minorlist', 'getIMOshowerList'],
+    'platepar': ['loadPlatepars', 'platepar'],
+    'UFOAnalyzerXML': ['UAXml'],
+    'UFOCapXML': ['UCXml'],
+    'kmlHandlers': ['trackCsvtoKML', 'trackKMLtoCsv', 'getTrackDetails', 'readCameraKML'],
+}
+__all__ = [name for names in _submodules.values() for name in names]
+__getattr__, __dir__ = lazyPackage(__name__, {name: mod for mod, names in _submodules.items() for name in names})
@@ -4,10 +4,15 @@
 # Copyright (C) 2018-2023 Mark McIntyre
 
 import os
+import sys
 import numpy as np
 import configparser as crp
 import json
 import datetime
+import mmap
+import glob
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     from ..utils import date2JD, angleBetweenSphericalCoords
@@ -27,22 +32,83 @@ def filterFTPforSpecificTime(ftpfile, dtstr):
             full name of the new file containing just matching events  
             the number of matching events  
     """
-    meteor_list = loadFTPDetectInfo(ftpfile, time_offsets=None, join_broken_meteors=True, locdata=None)
+    meteors = iterFTPDetectInfo(ftpfile, time_offsets=None, join_broken_meteors=True, locdata=None)
     refdt = datetime.datetime.strptime(dtstr, '%Y%m%d_%H%M%S')
     #print(refdt)
     new_met_list = []
-    for met in meteor_list:
+    for met in meteors:
         #print(met.ff_name)
         dtpart = datetime.datetime.strptime(met.ff_name[10:25], '%Y%m%d_%H%M%S')
+        # the file is in time order so once we're past the target there's nothing more to find
+        if (dtpart - refdt).total_seconds() > 21:
+            break
         tdiff = (refdt - dtpart).seconds
         #print(tdiff)
         if abs(tdiff) < 21:
             print('adding one entry')
             new_met_list.append(met)
+    meteors.close()
     newname = writeNewFTPFile(ftpfile, new_met_list)
     return newname, len(new_met_list)
 
 
+def filterFTPforSpecificTimes(ftpfile, dtstrs, tolerance=21, combined=False, outdir=None):
+    """ filter FTPdetect file for a list of events, by time, and copy them into new files. The file is 
+    only read once, and the source file is left untouched.  
+
+    Arguments:  
+        ftpfile     - [string] full path to the ftpdetect file to filter  
+        dtstrs      - [list] date/times of the required events in yyyymmdd_hhmmss format, or datetimes  
+
+    Keyword arguments:  
+        tolerance   - [float or list] how many seconds before each event the FF file may start. Default 21  
+        combined    - [bool] write all matches into one file rather than one file per event. Default False  
+        outdir      - [string] where to write the new files. Default is the folder containing ftpfile  
+
+    Returns:  
+        If combined is False, a list containing a tuple for each event of  
+            full name of the new file containing the matching meteors  
+            the number of matching meteors  
+        If combined is True, a single tuple of the file name and number of matching meteors.  
+        The new files are named after the source with the event time or "_filtered" appended.  
+    """
+    srcdir, fname = os.path.split(ftpfile)
+    if outdir is None:
+        outdir = srcdir
+    basename, _ = os.path.splitext(fname)
+    refdts = [dt if isinstance(dt, datetime.datetime) else datetime.datetime.strptime(dt, '%Y%m%d_%H%M%S') 
+        for dt in dtstrs]
+    tols = np.broadcast_to(np.asarray(tolerance, dtype=np.float64), (len(refdts),))
+
+    meteor_list = loadFTPDetectInfo(ftpfile, time_offsets=None, join_broken_meteors=True, columnar=True)
+    # use the FF file times to the whole second, as filterFTPforSpecificTime does, so that both
+    # filters select the same meteors
+    starts = np.array([np.datetime64(datetime.datetime.strptime(met.ff_name[10:25], '%Y%m%d_%H%M%S'), 's')
+        for met in meteor_list], dtype='datetime64[s]').astype(np.int64)
+    order = np.argsort(starts, kind='stable')
+    starts = starts[order]
+
+    results = []
+    allmatches = set()
+    for refdt, tol in zip(refdts, tols):
+        refsecs = np.datetime64(refdt.replace(microsecond=0), 's').astype(np.int64)
+        # an FF file matches if it starts no later than the event and less than tol seconds before it
+        lo = np.searchsorted(starts, refsecs - tol, side='right')
+        hi = np.searchsorted(starts, refsecs, side='right')
+        matches = sorted(order[lo:hi])
+        if combined:
+            allmatches.update(matches)
+            continue
+        newname = os.path.join(outdir, f'{basename}_{refdt.strftime("%Y%m%d_%H%M%S")}.txt')
+        writeFTPDetectFile(newname, [meteor_list[i] for i in matches], outdir)
+        results.append((newname, len(matches)))
+    if combined:
+        newname = os.path.join(outdir, f'{basename}_filtered.txt')
+        writeFTPDetectFile(newname, [meteor_list[i] for i in sorted(allmatches)], outdir)
+        return newname, len(allmatches)
+    return results
+
+
 def writeNewFTPFile(srcname, metlist):
     """ creates a FTPDetect file from a list of MeteorObservation objects  
         
@@ -62,25 +128,47 @@ def writeNewFTPFile(srcname, metlist):
         pass
     if os.path.isfile(srcname):
         srcname = srcname[:-4] + '_new.txt'
-    with open(srcname, 'w') as ftpf:
-        _writeFTPHeader(ftpf, len(metlist), outdir, False)
-        metno = 1
-        ffname = ''
-        for met in metlist:
-            if ffname == met.ff_name:
-                metno = metno + 1
-            else:
-                metno = 1
-                ffname = met.ff_name
-            _writeOneMeteor(ftpf, metno, met.station_id, met.time_data, len(met.frames), met.fps, met.frames, 
-                np.degrees(met.ra_data), np.degrees(met.dec_data), 
-                np.degrees(met.azim_data), np.degrees(met.elev_data),
-                None, met.mag_data, False, met.x_data, met.y_data, met.ff_name)
+    writeFTPDetectFile(srcname, metlist, outdir)
     return srcname
 
 
+def writeFTPDetectFile(outname, metlist, fldr=None):
+    """ writes a list of MeteorObservation objects to an FTPDetect file. Each meteor's data is formatted 
+    in one operation and the file is written in a single call.  
+
+    Arguments:  
+        outname     - [string] full path to the file to create. Any existing file is overwritten.  
+        metlist     - list of MeteorObservation objects  
+
+    Keyword arguments:  
+        fldr        - [string] folder name to put in the file header. Default is the folder containing outname.  
+
+    Returns:  
+        nothing  
+    """
+    if fldr is None:
+        fldr, _ = os.path.split(outname)
+    procdt = datetime.datetime.now()
+    blocks = [_formatFTPHeader(len(metlist), fldr, False)]
+    metno = 1
+    ffname = ''
+    for met in metlist:
+        if ffname == met.ff_name:
+            metno = metno + 1
+        else:
+            metno = 1
+            ffname = met.ff_name
+        blocks.append(_formatOneMeteor(metno, met.station_id, met.time_data, len(met.frames), met.fps, met.frames, 
+            np.degrees(met.ra_data), np.degrees(met.dec_data), 
+            np.degrees(met.azim_data), np.degrees(met.elev_data),
+            None, met.mag_data, False, met.x_data, met.y_data, met.ff_name, procdt))
+    with open(outname, 'w') as ftpf:
+        ftpf.write(''.join(blocks))
+    return
+
+
 def loadFTPDetectInfo(ftpdetectinfo_file_name, time_offsets=None,
-        join_broken_meteors=True, locdata=None):
+        join_broken_meteors=True, locdata=None, columnar=False, cache=False, compact=False):
     """ Loads an FTPDEtect file into a list of MeteorObservation objects  
 
     Arguments:  
@@ -94,280 +182,299 @@ def loadFTPDetectInfo(ftpdetectinfo_file_name, time_offsets=None,
     Keyword arguments:  
         time_offsets: [dict] (key, value) pairs of (stations_id, time_offset) for every station. None by 
             default.
-        join_broken_meteors: [bool] Join meteors broken across 2 FF files.
+        join_broken_meteors: [bool] Join meteors broken across 2 or more FF files.
+        locdata: [dict] station_code, lat, lon and elev of the camera. Default None, read from the .config 
+            or platepars file alongside the FTPdetectinfo file.  
+        columnar: [bool] parse the file in one pass into a MeteorTable, and return MeteorObservation objects 
+            that are views onto the table's arrays. Default False.  
+        cache: [bool] use or create a parquet copy of the parsed data alongside the file. Implies columnar. 
+            Default False. See loadFTPDetectTable.  
+        compact: [bool] return CompactMeteorObservation objects, which store pixel coordinates and 
+            magnitudes as float32. Default False.  
 
 
     Return:  
         meteor_list: [list] A list of MeteorObservation objects filled with data from the FTPdetectinfo file.  
 
     """
-    stations={}
-    if locdata is None:
-        dirname, fname = os.path.split(ftpdetectinfo_file_name)
-        cfgfile = os.path.join(dirname, '.config')
-        cfg = crp.ConfigParser()
-        cfg.read(cfgfile)
-        try: 
-            lat = float(cfg['System']['latitude'].split()[0])
-            lon = float(cfg['System']['longitude'].split()[0])
-            height = float(cfg['System']['elevation'].split()[0])
-        except:
-            # try reading from platepars file
-            ppf = os.path.join(dirname, 'platepars_all_recalibrated.json')
-            if not os.path.isfile(ppf):
-                return []
-            js = json.load(open(ppf, 'r'))
-            if len(js) < 10:
-                return []
-            lat = js[list(js.keys())[0]]['lat']
-            lon = js[list(js.keys())[0]]['lon']
-            height = js[list(js.keys())[0]]['elev']
-        statid= fname.split('_')[1]
-    else:
-        statid = locdata['station_code']
-        lat = float(locdata['lat'])
-        lon = float(locdata['lon'])
-        height = float(locdata['elev'])
+    if columnar or cache:
+        table = loadFTPDetectTable(ftpdetectinfo_file_name, time_offsets=time_offsets, locdata=locdata, 
+            cache=cache, compact=compact)
+        if table is None:
+            return []
+        meteor_list = table.toMeteorList()
+        if join_broken_meteors:
+            meteor_list = _joinBrokenMeteors(meteor_list)
+        return meteor_list
 
+    stations={}
+    loc = _getStationLocation(ftpdetectinfo_file_name, locdata)
+    if loc is None:
+        return []
+    statid, lat, lon, height = loc
     stations[statid] = [np.radians(lat), np.radians(lon), height*1000]
-    meteor_list = []
-
-    with open(ftpdetectinfo_file_name) as f:
-        # Skip the header
-        for i in range(11):
-            next(f)
-
-        current_meteor = None
-
-        bin_name = False
-        cal_name = False
-        meteor_header = False
-
-        for line in f:
-            # Skip comments
-            if line.startswith("#"):
-                continue
-
-            line = line.replace('\n', '').replace('\r', '')
-
-            # Skip the line if it is empty
-            if not line:
-                continue
-
-            if '-----' in line:
-                # Mark that the next line is the bin name
-                bin_name = True
-
-                # If the separator is read in, save the current meteor
-                if current_meteor is not None:
-                    current_meteor._finish()
-                    meteor_list.append(current_meteor)
-                continue
-
-            if bin_name:
-                bin_name = False
-
-                # Mark that the next line is the calibration file name
-                cal_name = True
-
-                # Save the name of the FF file
-                ff_name = line
-
-                # Extract the reference time from the FF bin file name
-                line = line.split('_')
-
-                # Count the number of string segments, and determine if it the old or new CAMS format
-                if len(line) == 6:
-                    sc = 1
-                else:
-                    sc = 0
-
-                ff_date = line[1 + sc]
-                ff_time = line[2 + sc]
-                milliseconds = line[3 + sc]
-
-                year = ff_date[:4]
-                month = ff_date[4:6]
-                day = ff_date[6:8]
-
-                hour = ff_time[:2]
-                minute = ff_time[2:4]
-                seconds = ff_time[4:6]
-
-                year, month, day, hour, minute, seconds, milliseconds = map(int, [year, month, day, hour, 
-                    minute, seconds, milliseconds])
-
-                # Calculate the reference JD time
-                jdt_ref = date2JD(year, month, day, hour, minute, seconds, milliseconds)
-                continue
-
-            if cal_name:
-                cal_name = False
-                # Mark that the next line is the meteor header
-                meteor_header = True
-                continue
-
-            if meteor_header:
-                meteor_header = False
-                line = line.split()
-
-                # Get the station ID and the FPS from the meteor header
-                station_id = line[0].strip()
-                fps = float(line[3])
-
-                # Try converting station ID to integer
-                try:
-                    station_id = int(station_id)
-                except:
-                    pass
-
-                # If the time offsets were given, apply the correction to the JD
-                if time_offsets is not None:
-                    if station_id in time_offsets:
-                        print('Applying time offset for station {:s} of {:.2f} s'.format(str(station_id),
-                            time_offsets[station_id]))
-
-                        jdt_ref += time_offsets[station_id]/86400.0
-                    else:
-                        print('Time offset for given station not found!')
-
-                # Get the station data
-                if station_id in stations:
-                    lat, lon, height = stations[station_id]
-                else:
-                    print('ERROR! No info for station ', station_id, ' found in CameraSites.txt file!')
-                    print('Exiting...')
-                    break
-                # Init a new meteor observation
-                current_meteor = MeteorObservation(jdt_ref, station_id, lat, lon, height, fps,
-                    ff_name=ff_name)
-                continue
-
-            # Read in the meteor observation point
-            if (current_meteor is not None) and (not bin_name) and (not cal_name) and (not meteor_header):
-
-                line = line.replace('\n', '').split()
-
-                # Read in the meteor frame, RA and Dec
-                frame_n = float(line[0])
-                x = float(line[1])
-                y = float(line[2])
-                ra = float(line[3])
-                dec = float(line[4])
-                azim = float(line[5])
-                elev = float(line[6])
-
-                # Read the visual magnitude, if present
-                if len(line) > 8:
-                    mag = line[8]
-                    if mag == 'inf':
-                        mag = None
-                    else:
-                        mag = float(mag)
-                else:
-                    mag = None
-
-                # Add the measurement point to the current meteor 
-                current_meteor._addPoint(frame_n, x, y, azim, elev, ra, dec, mag)
-
-        # Add the last meteor the the meteor list
-        if current_meteor is not None:
-            current_meteor._finish()
-            meteor_list.append(current_meteor)
+    meteor_list = list(_readFTPMeteors(ftpdetectinfo_file_name, stations, time_offsets, compact))
 
     # Concatenate observations across different FF files ###
     if join_broken_meteors:
+        meteor_list = _joinBrokenMeteors(meteor_list)
 
-        # Go through all meteors and compare the next observation
-        merged_indices = []
-        for i in range(len(meteor_list)):
-
-            # If the next observation was merged, skip it
-            if (i + 1) in merged_indices:
-                continue
-
-            # Get the current meteor observation
-            met1 = meteor_list[i]
-
-            if i >= (len(meteor_list) - 1):
-                break
-
-            # Get the next meteor observation
-            met2 = meteor_list[i + 1]
-            
-            # Compare only same station observations
-            if met1.station_id != met2.station_id:
-                continue
-
-            # Extract frame number
-            met1_frame_no = int(met1.ff_name.split("_")[-1].split('.')[0])
-            met2_frame_no = int(met2.ff_name.split("_")[-1].split('.')[0])
-
-            # Skip if the next FF is not exactly 256 frames later
-            if met2_frame_no != (met1_frame_no + 256):
-                continue
-
+    return meteor_list
 
-            # Check for frame continouty
-            if (met1.frames[-1] < 254) or (met2.frames[0] > 2):
-                continue
 
-            # Check if the next frame is close to the predicted position 
+def iterFTPDetectInfo(ftpdetectinfo_file_name, time_offsets=None, join_broken_meteors=True, locdata=None, 
+        compact=False):
+    """ Generator that reads an FTPDetect file and yields MeteorObservation objects one at a time, as 
+    each is read, so the whole file need not be held in memory.  
 
-            # Compute angular distance between the last 2 points on the first FF
-            ang_dist = angleBetweenSphericalCoords(met1.dec_data[-2], met1.ra_data[-2], met1.dec_data[-1],
-                met1.ra_data[-1])
+    Arguments:  
+        ftpdetectinfo_file_name: [str] Path to the FTPdetectinfo file.  
 
-            # Compute frame difference between the last frame on the 1st FF and the first frame on the 2nd FF
-            df = met2.frames[0] + (256 - met1.frames[-1])
+    Keyword arguments:  
+        time_offsets: [dict] (key, value) pairs of (stations_id, time_offset) for every station. None by 
+            default.
+        join_broken_meteors: [bool] Join meteors broken across 2 or more FF files. Up to 32 meteors are 
+            held back to see if a later one continues them, so segments further apart than that in the 
+            file are not joined.  
+        locdata: [dict] station_code, lat, lon and elev of the camera. Default None, read from the .config 
+            or platepars file alongside the FTPdetectinfo file.  
+        compact: [bool] yield CompactMeteorObservation objects. Default False.  
+
+    Yields:  
+        MeteorObservation objects, in the order each was first seen in the file.  
+
+    Example:  
+        for met in iterFTPDetectInfo(ftpfile):  
+            print(met.ff_name)  
+    """
+    loc = _getStationLocation(ftpdetectinfo_file_name, locdata)
+    if loc is None:
+        return
+    statid, lat, lon, height = loc
+    stations = {statid: [np.radians(lat), np.radians(lon), height*1000]}
+    meteors = _readFTPMeteors(ftpdetectinfo_file_name, stations, time_offsets, compact)
+    if join_broken_meteors:
+        meteors = _joinBrokenStream(meteors)
+    try:
+        for met in meteors:
+            yield met
+    finally:
+        meteors.close()
 
-            # Skip the pair if the angular distance between the last and first frames is 2x larger than the 
-            #   frame difference times the expected separation
-            ang_dist_between = angleBetweenSphericalCoords(met1.dec_data[-1], met1.ra_data[-1],
-                met2.dec_data[0], met2.ra_data[0])
 
-            if ang_dist_between > 2*df*ang_dist:
-                continue
+def loadFTPDetectTable(ftpdetectinfo_file_name, time_offsets=None, locdata=None, cache=False, compact=False):
+    """ Loads an FTPDetect file into a MeteorTable, a set of contiguous numpy arrays holding every 
+    measurement point in the file.  
 
-            # If all checks have passed, merge observations ###
-            # Recompute the frames
-            frames = 256.0 + met2.frames
-
-            # Recompute the time data
-            time_data = frames/met1.fps
+    Arguments:  
+        ftpdetectinfo_file_name: [str] Path to the FTPdetectinfo file.  
 
-            # Add the observations to first meteor object
-            met1.frames = np.append(met1.frames, frames)
-            met1.time_data = np.append(met1.time_data, time_data)
-            met1.x_data = np.append(met1.x_data, met2.x_data)
-            met1.y_data = np.append(met1.y_data, met2.y_data)
-            met1.azim_data = np.append(met1.azim_data, met2.azim_data)
-            met1.elev_data = np.append(met1.elev_data, met2.elev_data)
-            met1.ra_data = np.append(met1.ra_data, met2.ra_data)
-            met1.dec_data = np.append(met1.dec_data, met2.dec_data)
-            met1.mag_data = np.append(met1.mag_data, met2.mag_data)
+    Keyword arguments:  
+        time_offsets: [dict] (key, value) pairs of (stations_id, time_offset) for every station. None by 
+            default.
+        locdata: [dict] station_code, lat, lon and elev of the camera. Default None, read from the .config 
+            or platepars file alongside the FTPdetectinfo file.  
+        cache: [bool] If True, the parsed data are saved to {ftpfile}.parquet.snap and read from there 
+            on later calls, as long as the parquet file is newer than the FTPdetect file. Default False.  
+        compact: [bool] store x, y and mag as float32, and return CompactMeteorObservation views. 
+            Default False.  
 
-            # Merge the FF file name and create a list
-            if (met1.ff_name is not None) and (met2.ff_name is not None):
-                met1.ff_name = met1.ff_name + ',' + met2.ff_name
+    Return:  
+        a MeteorTable, or None if the station location could not be determined.  
 
-            # Sort all observations by time
-            met1._finish()
+    Note:  
+        Broken meteors are not joined. Use MeteorTable.toMeteorList() and loadFTPDetectInfo's joining 
+        if required, or call loadFTPDetectInfo with columnar=True.  
+        The cache is not used if time_offsets are supplied. If locdata is supplied, it overrides the 
+        location saved in the cache.  
+    """
+    cachefile = ftpdetectinfo_file_name + '.parquet.snap'
+    if cache and time_offsets is None and os.path.isfile(cachefile) and \
+            os.path.getmtime(cachefile) >= os.path.getmtime(ftpdetectinfo_file_name):
+        table = MeteorTable.fromDataFrame(pd.read_parquet(cachefile, engine='fastparquet'), compact=compact)
+        if locdata is not None:
+            table.latitude = np.radians(float(locdata['lat']))
+            table.longitude = np.radians(float(locdata['lon']))
+            table.height = float(locdata['elev'])*1000
+        return table
+
+    loc = _getStationLocation(ftpdetectinfo_file_name, locdata)
+    if loc is None:
+        return None
+    statid, lat, lon, height = loc
+    lat, lon, height = np.radians(lat), np.radians(lon), height*1000
 
-            # Indicate that the next observation is to be skipped
-            merged_indices.append(i + 1)
+    with open(ftpdetectinfo_file_name) as f:
+        lines = f.read().splitlines()[11:]
+    # drop comments and blank lines, then locate the separators in one pass
+    lines = [li for li in lines if li and not li.startswith('#')]
+    seps = [i for i, li in enumerate(lines) if '-----' in li]
+    seps.append(len(lines))
+
+    ff_names = []
+    station_ids = []
+    meteor_nos = []
+    fpss = []
+    jdt_refs = []
+    counts = []
+    pointlines = []
+    for s, e in zip(seps[:-1], seps[1:]):
+        if e - s < 4:
+            continue
+        ff_name = lines[s+1]
+        hdr = lines[s+3].split()
+        station_id = hdr[0].strip()
+        try:
+            station_id = int(station_id)
+        except ValueError:
+            pass
+        if station_id != statid:
+            print('ERROR! No info for station ', station_id, ' found in CameraSites.txt file!')
+            print('Exiting...')
+            break
+        jdt_ref = _ffNameToJD(ff_name)
+        if time_offsets is not None:
+            if station_id in time_offsets:
+                print('Applying time offset for station {:s} of {:.2f} s'.format(str(station_id),
+                    time_offsets[station_id]))
+                jdt_ref += time_offsets[station_id]/86400.0
+            else:
+                print('Time offset for given station not found!')
+        ff_names.append(ff_name)
+        station_ids.append(station_id)
+        meteor_nos.append(int(hdr[1]))
+        fpss.append(float(hdr[3]))
+        jdt_refs.append(jdt_ref)
+        counts.append(e - s - 4)
+        pointlines.extend(lines[s+4:e])
+
+    npts = len(pointlines)
+    tokens = ' '.join(pointlines).split()
+    if len(tokens) == 9 * npts:
+        pts = np.array(tokens, dtype=np.float64).reshape(npts, 9)
+    else:
+        # some lines are missing the magnitude so parse them individually
+        pts = np.full((npts, 9), np.nan)
+        for i, li in enumerate(pointlines):
+            vals = li.split()[:9]
+            pts[i, :len(vals)] = np.array(vals, dtype=np.float64)
+    # an infinite magnitude means the magnitude wasn't measured
+    pts[np.isinf(pts[:, 8]), 8] = np.nan
+
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    meteor_id = np.repeat(np.arange(len(counts)), counts)
+
+    # sort each meteor's points by frame number, keeping meteors in file order
+    order = np.lexsort((pts[:, 0], meteor_id))
+    pts = pts[order]
+
+    table = MeteorTable(meteor_id, pts[:, 0], pts[:, 1], pts[:, 2], np.radians(pts[:, 3]), np.radians(pts[:, 4]), 
+        np.radians(pts[:, 5]), np.radians(pts[:, 6]), pts[:, 8], offsets, 
+        np.array(ff_names, dtype=object), np.array(station_ids, dtype=object), np.array(meteor_nos, dtype=np.int64), 
+        np.array(fpss), np.array(jdt_refs), lat, lon, height, compact=compact)
+    if cache and time_offsets is None:
+        try:
+            table.toDataFrame().to_parquet(cachefile, engine='fastparquet', compression='snappy')
+        except Exception:
+            print(f'unable to save {cachefile}')
+    return table
+
+
+def loadFTPDetectTree(datadir, camlist, start, end, workers=None, asDict=False, cache=False):
+    """ Load all the FTPDetect files for a list of cameras and a range of dates, in parallel.  
 
-        # Removed merged meteors from the list
-        meteor_list = [element for i, element in enumerate(meteor_list) if i not in merged_indices]
+    Arguments:  
+        datadir:    [string] root of the data, see notes  
+        camlist:    [list] list of camera IDs eg ['UK0006','UK000F']  
+        start:      [string] start date in YYYYMMDD format  
+        end:        [string] end date in YYYYMMDD format  
 
-    return meteor_list
+    Keyword arguments:  
+        workers:    [int] number of processes to use. Default None, meaning one per CPU.  
+        asDict:     [bool] return a dict of MeteorTables keyed by (camera, night). Default False.  
+        cache:      [bool] use or create parquet caches of each file, see loadFTPDetectTable. Default False.  
 
+    Returns:  
+        if asDict is False, a pandas dataframe containing every point from every file, in the format 
+        created by MeteorTable.toDataFrame, with additional columns "night" and "source", and meteor_id 
+        renumbered to be unique across the dataframe.  
+        If asDict is True, a dict of MeteorTables keyed by (camera, night) where night is in YYYYMMDD format.  
+
+    Notes:  
+        The function expects data to be stored in RMS folder structures as follows  
+            {datadir}/{cameraid}/ConfirmedFiles/{cameraid_date_time_*}  
+        Each folder must contain an FTPdetectinfo file and either a .config or platepars_all file.  
+        Folders where the camera location can't be found are skipped.  
+    """
+    sdt = datetime.datetime.strptime(start, '%Y%m%d')
+    edt = datetime.datetime.strptime(end, '%Y%m%d')
+    jobs = []
+    d = sdt
+    while d <= edt:
+        dtstr = d.strftime('%Y%m%d')
+        for cam in camlist:
+            cam = cam.upper()
+            camdir = os.path.join(datadir, cam, 'ConfirmedFiles')
+            for dirname in sorted(glob.glob1(camdir, f'{cam}_{dtstr}*')):
+                ftpdet = os.path.join(camdir, dirname, f'FTPdetectinfo_{dirname}.txt')
+                if os.path.isfile(ftpdet):
+                    # resolve the location here so workers don't each reread the config files
+                    locdata = stationLocations.get(ftpdet)
+                    if locdata is not None:
+                        jobs.append((cam, dtstr, ftpdet, cache, locdata))
+        d = d + datetime.timedelta(days=1)
+
+    if workers == 1 or len(jobs) < 2:
+        results = [_loadOneTable(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_loadOneTable, jobs))
 
-class MeteorObservation(object):
-    """ Container for meteor observations.  
+    if asDict:
+        tables = {}
+        for cam, dtstr, ftpdet, table in results:
+            if table is None:
+                continue
+            if (cam, dtstr) in tables:
+                # more than one capture folder for this night. Each table numbers its meteors from zero, so
+                # offset the ids or the last meteor of one folder could be merged with the first of the next
+                prev = tables[(cam, dtstr)]
+                df = table.toDataFrame()
+                df['meteor_id'] += len(prev)
+                tables[(cam, dtstr)] = MeteorTable.fromDataFrame(pd.concat([prev.toDataFrame(), df], ignore_index=True), 
+                    compact=prev.compact)
+            else:
+                tables[(cam, dtstr)] = table
+        return tables
+
+    dfs = []
+    nmets = 0
+    for cam, dtstr, ftpdet, table in results:
+        if table is None:
+            continue
+        df = table.toDataFrame()
+        df['meteor_id'] += nmets
+        df['night'] = dtstr
+        df['source'] = ftpdet
+        nmets += len(table)
+        dfs.append(df)
+    if len(dfs) == 0:
+        return pd.DataFrame()
+    return pd.concat(dfs, ignore_index=True)
+
+
+class _MeteorObservationBase(object):
+    """ Internal base class holding the data and behaviour shared by MeteorObservation and 
+    CompactMeteorObservation  
     """
-    def __init__(self, jdt_ref, station_id, latitude, longitude, height, fps, ff_name=None):
-        """ Construct the MeteorObservation object.  
+    __slots__ = ('jdt_ref', 'station_id', 'latitude', 'longitude', 'height', 'fps', 'ff_name', 
+        'frames', 'time_data', 'x_data', 'y_data', 'azim_data', 'elev_data', 'ra_data', 'dec_data', 
+        'mag_data', 'pixel_dtype')
+
+    def __init__(self, jdt_ref, station_id, latitude, longitude, height, fps, ff_name=None, 
+            pixel_dtype=None):
+        """ Construct the observation.  
         Arguments:  
             jdt_ref: [float] Reference Julian date when the relative time is t = 0s.  
             station_id: [str] Station ID.  
@@ -378,7 +485,10 @@ class MeteorObservation(object):
 
         Keyword arguments:  
             ff_name: [str] Name of the originating FF file. 
+            pixel_dtype: [numpy dtype] type used for x_data, y_data and mag_data. Default None, the 
+                types are left as parsed.  
         """
+        self.pixel_dtype = pixel_dtype
         self.jdt_ref = jdt_ref
         self.station_id = station_id
         self.latitude = latitude
@@ -395,7 +505,6 @@ class MeteorObservation(object):
         self.ra_data = []
         self.dec_data = []
         self.mag_data = []
-        self.abs_mag_data = []
 
     def _addPoint(self, frame_n, x, y, azim, elev, ra, dec, mag):
         """ Adds the measurement point to the meteor.
@@ -435,74 +544,931 @@ class MeteorObservation(object):
         self.elev_data = np.array(self.elev_data)
         self.ra_data = np.array(self.ra_data)
         self.dec_data = np.array(self.dec_data)
-        self.mag_data = np.array(self.mag_data)
+        if self.pixel_dtype is None:
+            self.mag_data = np.array(self.mag_data)
+        else:
+            # missing magnitudes become nan
+            self.mag_data = np.array(self.mag_data, dtype=np.float64)
         # Sort by frame
         temp_arr = np.c_[self.frames, self.time_data, self.x_data, self.y_data, self.azim_data, 
         self.elev_data, self.ra_data, self.dec_data, self.mag_data]
         temp_arr = temp_arr[np.argsort(temp_arr[:, 0])]
         self.frames, self.time_data, self.x_data, self.y_data, self.azim_data, self.elev_data, self.ra_data, \
             self.dec_data, self.mag_data = temp_arr.T
+        if self.pixel_dtype is not None:
+            # copy each column out of temp_arr so the float64 block can be released
+            self.frames, self.time_data, self.azim_data, self.elev_data, self.ra_data, self.dec_data = \
+                [np.ascontiguousarray(arr) for arr in (self.frames, self.time_data, self.azim_data, self.elev_data, 
+                    self.ra_data, self.dec_data)]
+            self.x_data = np.ascontiguousarray(self.x_data, dtype=self.pixel_dtype)
+            self.y_data = np.ascontiguousarray(self.y_data, dtype=self.pixel_dtype)
+            self.mag_data = np.ascontiguousarray(self.mag_data, dtype=self.pixel_dtype)
+
+    @property
+    def nbytes(self):
+        """ Approximate memory used by the observation in bytes, being the size of the object and its 
+        instance dictionary if any, plus the size of its data arrays. Arrays that are views onto a 
+        MeteorTable count only the part they view, even though the whole table is held in memory.  
+        """
+        total = sys.getsizeof(self)
+        if hasattr(self, '__dict__'):
+            total += sys.getsizeof(self.__dict__)
+        for arr in (self.frames, self.time_data, self.x_data, self.y_data, self.azim_data, self.elev_data, 
+                self.ra_data, self.dec_data, self.mag_data):
+            if isinstance(arr, np.ndarray):
+                total += arr.nbytes
+            else:
+                total += sys.getsizeof(arr)
+        return total
+
+
+class CompactMeteorObservation(_MeteorObservationBase):
+    """ Memory-efficient container for meteor observations. It has no instance dictionary and, 
+    by default, holds pixel coordinates and magnitudes as float32. Angles and times are always float64.  
+    """
+    __slots__ = ()
+
+    def __init__(self, jdt_ref, station_id, latitude, longitude, height, fps, ff_name=None, 
+            pixel_dtype=np.float32):
+        """ Construct the CompactMeteorObservation object.  
+        Arguments:  
+            jdt_ref: [float] Reference Julian date when the relative time is t = 0s.  
+            station_id: [str] Station ID.  
+            latitude: [float] Latitude +N in radians.  
+            longitude: [float] Longitude +E in radians.  
+            height: [float] Elevation above sea level (MSL) in meters. 
+            fps: [float] Frames per second. 
+
+        Keyword arguments:  
+            ff_name: [str] Name of the originating FF file. 
+            pixel_dtype: [numpy dtype] type used for x_data, y_data and mag_data. Default float32. 
+                If None, the types are left as parsed.  
+        """
+        super().__init__(jdt_ref, station_id, latitude, longitude, height, fps, ff_name=ff_name, 
+            pixel_dtype=pixel_dtype)
+
+
+class MeteorObservation(_MeteorObservationBase):
+    """ Container for meteor observations.  
+    """
+    def __init__(self, jdt_ref, station_id, latitude, longitude, height, fps, ff_name=None):
+        """ Construct the MeteorObservation object.  
+        Arguments:  
+            jdt_ref: [float] Reference Julian date when the relative time is t = 0s.  
+            station_id: [str] Station ID.  
+            latitude: [float] Latitude +N in radians.  
+            longitude: [float] Longitude +E in radians.  
+            height: [float] Elevation above sea level (MSL) in meters. 
+            fps: [float] Frames per second. 
+
+        Keyword arguments:  
+            ff_name: [str] Name of the originating FF file. 
+        """
+        super().__init__(jdt_ref, station_id, latitude, longitude, height, fps, ff_name=ff_name, 
+            pixel_dtype=None)
+        self.abs_mag_data = []
+
+
+class MeteorTable(object):
+    """ Columnar container for the contents of an FTPDetect file.  
+
+    Every measurement point in the file is held in contiguous numpy arrays, ordered by meteor then frame. 
+    The points belonging to meteor i are those from offsets[i] to offsets[i+1].  
+
+    Point arrays:  
+        meteor_id: [int] index of the meteor the point belongs to  
+        frame: [float] frame number from the reference time  
+        x, y: [float] image coordinates  
+        ra, dec: [float] J2000 right ascension and declination in radians  
+        az, alt: [float] azimuth and elevation in radians  
+        mag: [float] visual magnitude, nan if not measured  
+
+    Per-meteor arrays:  
+        offsets: [int] index of each meteor's first point, with a final entry equal to the number of points  
+        ff_name, station_id, meteor_no, fps, jdt_ref  
+
+    Station location:  
+        latitude, longitude: [float] radians  
+        height: [float] elevation  
+
+    If compact is True, x, y and mag are stored as float32 and meteors are returned as 
+    CompactMeteorObservation objects.  
+    """
+    def __init__(self, meteor_id, frame, x, y, ra, dec, az, alt, mag, offsets, 
+            ff_name, station_id, meteor_no, fps, jdt_ref, latitude, longitude, height, compact=False):
+        self.compact = compact
+        pixel_dtype = np.float32 if compact else np.float64
+        self.meteor_id = meteor_id
+        self.frame = frame
+        self.x = np.ascontiguousarray(x, dtype=pixel_dtype)
+        self.y = np.ascontiguousarray(y, dtype=pixel_dtype)
+        self.ra = ra
+        self.dec = dec
+        self.az = az
+        self.alt = alt
+        self.mag = np.ascontiguousarray(mag, dtype=pixel_dtype)
+        self.offsets = offsets
+        self.ff_name = ff_name
+        self.station_id = station_id
+        self.meteor_no = meteor_no
+        self.fps = fps
+        self.jdt_ref = jdt_ref
+        self.latitude = latitude
+        self.longitude = longitude
+        self.height = height
+        self.time = frame / fps[meteor_id] if len(fps) > 0 else np.zeros(0)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.meteor(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.meteor(i)
+
+    def meteor(self, i):
+        """ Return meteor i as a MeteorObservation whose data arrays are views onto this table """
+        sl = slice(self.offsets[i], self.offsets[i+1])
+        if self.compact:
+            met = CompactMeteorObservation(self.jdt_ref[i], self.station_id[i], self.latitude, self.longitude, 
+                self.height, self.fps[i], ff_name=self.ff_name[i])
+        else:
+            met = MeteorObservation(self.jdt_ref[i], self.station_id[i], self.latitude, self.longitude, 
+                self.height, self.fps[i], ff_name=self.ff_name[i])
+        met.frames = self.frame[sl]
+        met.time_data = self.time[sl]
+        met.x_data = self.x[sl]
+        met.y_data = self.y[sl]
+        met.azim_data = self.az[sl]
+        met.elev_data = self.alt[sl]
+        met.ra_data = self.ra[sl]
+        met.dec_data = self.dec[sl]
+        met.mag_data = self.mag[sl]
+        return met
+
+    def toMeteorList(self):
+        """ Return a list of MeteorObservation objects, one per meteor in the table """
+        return [self.meteor(i) for i in range(len(self))]
+
+    @property
+    def nbytes(self):
+        """ Memory used by the table's arrays in bytes, excluding the strings in ff_name and station_id """
+        return sum(arr.nbytes for arr in (self.meteor_id, self.frame, self.x, self.y, self.ra, self.dec, 
+            self.az, self.alt, self.mag, self.offsets, self.ff_name, self.station_id, self.meteor_no, 
+            self.fps, self.jdt_ref, self.time))
+
+    def toDataFrame(self):
+        """ Return the table as a pandas dataframe with one row per point. The per-meteor and station 
+        fields are repeated on each row. Angles are in radians.  
+        """
+        counts = np.diff(self.offsets)
+        return pd.DataFrame({'meteor_id': self.meteor_id, 'frame': self.frame, 'x': self.x, 'y': self.y, 
+            'ra': self.ra, 'dec': self.dec, 'az': self.az, 'alt': self.alt, 'mag': self.mag, 
+            'ff_name': np.repeat(self.ff_name, counts), 'station_id': np.repeat(self.station_id, counts), 
+            'meteor_no': np.repeat(self.meteor_no, counts), 'fps': np.repeat(self.fps, counts), 
+            'jdt_ref': np.repeat(self.jdt_ref, counts), 'latitude': self.latitude, 
+            'longitude': self.longitude, 'height': self.height})
+
+    @classmethod
+    def fromDataFrame(cls, df, compact=False):
+        """ Create a MeteorTable from a dataframe created by toDataFrame. Meteors with no points are lost.  
+        """
+        meteor_id = df['meteor_id'].to_numpy()
+        # renumber the meteors in case the dataframe has been filtered
+        if len(df) > 0:
+            firsts = np.flatnonzero(np.r_[True, meteor_id[1:] != meteor_id[:-1]])
+        else:
+            firsts = np.zeros(0, dtype=np.int64)
+        offsets = np.append(firsts, len(df)).astype(np.int64)
+        meteor_id = np.repeat(np.arange(len(firsts)), np.diff(offsets))
+        if len(df) > 0:
+            lat, lon, height = df['latitude'].iloc[0], df['longitude'].iloc[0], df['height'].iloc[0]
+        else:
+            lat, lon, height = np.nan, np.nan, np.nan
+        return cls(meteor_id, df['frame'].to_numpy(), df['x'].to_numpy(), df['y'].to_numpy(), 
+            df['ra'].to_numpy(), df['dec'].to_numpy(), df['az'].to_numpy(), df['alt'].to_numpy(), 
+            df['mag'].to_numpy(), offsets, df['ff_name'].to_numpy(dtype=object)[firsts], 
+            df['station_id'].to_numpy(dtype=object)[firsts], df['meteor_no'].to_numpy()[firsts], 
+            df['fps'].to_numpy()[firsts], df['jdt_ref'].to_numpy()[firsts], lat, lon, height, compact=compact)
+
+
+class FTPDetectIndex(object):
+    """ Byte-offset index into an FTPDetect file, allowing single meteors to be read without parsing 
+    the whole file.  
+
+    The index is built by scanning a memory-mapped copy of the file for the separator lines, and is saved 
+    alongside the file as {ftpfile}.idx. It's rebuilt automatically if the FTPDetect file's size or 
+    modification time changes.  
+
+    Arguments:  
+        ftpdetectinfo_file_name: [str] Path to the FTPdetectinfo file.  
+
+    Keyword arguments:  
+        locdata: [dict] station_code, lat, lon and elev of the camera. Default None, read from the .config 
+            or platepars file alongside the FTPdetectinfo file.  
+        save: [bool] save the index to disk. Default True.  
+
+    Example:  
+        idx = FTPDetectIndex(ftpfile)  
+        met = idx.get('FF_UK0006_20230421_212224_982_0115712.fits')  
+    """
+    def __init__(self, ftpdetectinfo_file_name, locdata=None, save=True):
+        self.ftpfile = ftpdetectinfo_file_name
+        self.idxfile = ftpdetectinfo_file_name + '.idx'
+        self.locdata = locdata
+        self.save = save
+        self.stations = None
+        self._load()
+
+    def _load(self):
+        """ load the saved index if its still valid, otherwise rebuild it """
+        stat = os.stat(self.ftpfile)
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        entries = None
+        if os.path.isfile(self.idxfile):
+            try:
+                with open(self.idxfile, 'r') as inf:
+                    js = json.load(inf)
+                if js['mtime'] == self.mtime and js['size'] == self.size:
+                    entries = js['entries']
+            except Exception:
+                entries = None
+        if entries is None:
+            entries = self._scan()
+            if self.save:
+                try:
+                    with open(self.idxfile, 'w') as outf:
+                        json.dump({'mtime': self.mtime, 'size': self.size, 'entries': entries}, outf)
+                except Exception:
+                    print(f'unable to save index {self.idxfile}')
+        self.entries = entries
+        self.ff_index = {}
+        for i, ent in enumerate(entries):
+            self.ff_index.setdefault(ent[0], []).append(i)
+        self.jdt_refs = np.array([ent[2] for ent in entries])
+        self.time_order = np.argsort(self.jdt_refs, kind='stable')
+
+    def _scan(self):
+        """ scan the file for separators, returning [ff_name, meteor_no, jdt_ref, start, end] per meteor """
+        entries = []
+        if self.size == 0:
+            return entries
+        with open(self.ftpfile, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                # skip the 11 line file header, which contains separators of its own
+                pos = 0
+                for i in range(11):
+                    pos = mm.find(b'\n', pos) + 1
+                    if pos == 0:
+                        return entries
+                seps = []
+                pos = mm.find(b'-----', pos)
+                while pos >= 0:
+                    linestart = mm.rfind(b'\n', 0, pos) + 1
+                    seps.append(linestart)
+                    pos = mm.find(b'\n', pos)
+                    if pos < 0:
+                        break
+                    pos = mm.find(b'-----', pos)
+                seps.append(self.size)
+                for start, end in zip(seps[:-1], seps[1:]):
+                    hdrlines = mm[start:min(end, start + 1024)].splitlines()
+                    if len(hdrlines) < 4:
+                        continue
+                    ff_name = hdrlines[1].decode().strip()
+                    meteor_no = int(hdrlines[3].split()[1])
+                    entries.append([ff_name, meteor_no, _ffNameToJD(ff_name), start, end])
+            finally:
+                mm.close()
+        return entries
+
+    def _stations(self):
+        if self.stations is None:
+            loc = _getStationLocation(self.ftpfile, self.locdata)
+            if loc is None:
+                self.stations = {}
+            else:
+                statid, lat, lon, height = loc
+                self.stations = {statid: [np.radians(lat), np.radians(lon), height*1000]}
+        return self.stations
+
+    def isValid(self):
+        """ True if the index matches the current state of the FTPDetect file """
+        stat = os.stat(self.ftpfile)
+        return stat.st_mtime == self.mtime and stat.st_size == self.size
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _read(self, i):
+        """ parse the i'th meteor block in the file """
+        if not self.isValid():
+            self._load()
+        _, _, _, start, end = self.entries[i]
+        with open(self.ftpfile, 'rb') as f:
+            f.seek(start)
+            lines = f.read(end - start).decode().splitlines()
+        mets = list(_parseFTPLines(lines, self._stations()))
+        if len(mets) == 0:
+            return None
+        return mets[0]
+
+    def getByIndex(self, i):
+        """ Return the i'th meteor in the file as a MeteorObservation """
+        return self._read(i)
+
+    def get(self, ff_name, meteor_no=1):
+        """ Return the meteor from the named FF file as a MeteorObservation, or None if not found.  
+
+        Arguments:  
+            ff_name: [str] name of the FF file  
+
+        Keyword arguments:  
+            meteor_no: [int] which meteor, if the FF file contains several. Default 1.  
+        """
+        if not self.isValid():
+            self._load()
+        for i in self.ff_index.get(ff_name, []):
+            if self.entries[i][1] == meteor_no:
+                return self._read(i)
+        return None
+
+    def findByTime(self, jd_start, jd_end):
+        """ Return a list of the meteors whose FF file starts between two julian dates """
+        if not self.isValid():
+            self._load()
+        srt = self.jdt_refs[self.time_order]
+        lo = np.searchsorted(srt, jd_start, side='left')
+        hi = np.searchsorted(srt, jd_end, side='right')
+        return [self._read(i) for i in self.time_order[lo:hi]]
+
+
+def _readFTPMeteors(ftpdetectinfo_file_name, stations, time_offsets=None, compact=False):
+    """ Internal generator that reads an FTPDetect file line by line, yielding each MeteorObservation 
+    as soon as it is complete. Broken meteors are not joined.  
+    """
+    with open(ftpdetectinfo_file_name) as f:
+        # Skip the header
+        for i in range(11):
+            next(f)
+        yield from _parseFTPLines(f, stations, time_offsets, compact)
+
+
+def _parseFTPLines(lines, stations, time_offsets=None, compact=False):
+    """ Internal generator that parses the meteor blocks of an FTPDetect file from an iterable of lines, 
+    yielding each MeteorObservation as soon as it is complete.  
+    """
+    metclass = CompactMeteorObservation if compact else MeteorObservation
+    current_meteor = None
+
+    bin_name = False
+    cal_name = False
+    meteor_header = False
+
+    for line in lines:
+        # Skip comments
+        if line.startswith("#"):
+            continue
+
+        line = line.replace('\n', '').replace('\r', '')
+
+        # Skip the line if it is empty
+        if not line:
+            continue
+
+        if '-----' in line:
+            # Mark that the next line is the bin name
+            bin_name = True
+
+            # If the separator is read in, the current meteor is complete
+            if current_meteor is not None:
+                current_meteor._finish()
+                yield current_meteor
+                current_meteor = None
+            continue
+
+        if bin_name:
+            bin_name = False
+
+            # Mark that the next line is the calibration file name
+            cal_name = True
+
+            # Save the name of the FF file
+            ff_name = line
+
+            # Calculate the reference JD time from the FF bin file name
+            jdt_ref = _ffNameToJD(ff_name)
+            continue
+
+        if cal_name:
+            cal_name = False
+            # Mark that the next line is the meteor header
+            meteor_header = True
+            continue
+
+        if meteor_header:
+            meteor_header = False
+            line = line.split()
+
+            # Get the station ID and the FPS from the meteor header
+            station_id = line[0].strip()
+            fps = float(line[3])
+
+            # Try converting station ID to integer
+            try:
+                station_id = int(station_id)
+            except:
+                pass
+
+            # If the time offsets were given, apply the correction to the JD
+            if time_offsets is not None:
+                if station_id in time_offsets:
+                    print('Applying time offset for station {:s} of {:.2f} s'.format(str(station_id),
+                        time_offsets[station_id]))
+
+                    jdt_ref += time_offsets[station_id]/86400.0
+                else:
+                    print('Time offset for given station not found!')
+
+            # Get the station data
+            if station_id in stations:
+                lat, lon, height = stations[station_id]
+            else:
+                print('ERROR! No info for station ', station_id, ' found in CameraSites.txt file!')
+                print('Exiting...')
+                break
+            # Init a new meteor observation
+            current_meteor = metclass(jdt_ref, station_id, lat, lon, height, fps,
+                ff_name=ff_name)
+            continue
+
+        # Read in the meteor observation point
+        if (current_meteor is not None) and (not bin_name) and (not cal_name) and (not meteor_header):
+
+            line = line.replace('\n', '').split()
+
+            # Read in the meteor frame, RA and Dec
+            frame_n = float(line[0])
+            x = float(line[1])
+            y = float(line[2])
+            ra = float(line[3])
+            dec = float(line[4])
+            azim = float(line[5])
+            elev = float(line[6])
+
+            # Read the visual magnitude, if present
+            if len(line) > 8:
+                mag = line[8]
+                if mag == 'inf':
+                    mag = None
+                else:
+                    mag = float(mag)
+            else:
+                mag = None
+
+            # Add the measurement point to the current meteor 
+            current_meteor._addPoint(frame_n, x, y, azim, elev, ra, dec, mag)
+
+    # Return the last meteor in the file
+    if current_meteor is not None:
+        current_meteor._finish()
+        yield current_meteor
+
+
+def _loadOneTable(job):
+    """ Internal function to load one FTPDetect file as part of loadFTPDetectTree """
+    cam, dtstr, ftpdet, cache, locdata = job
+    return cam, dtstr, ftpdet, loadFTPDetectTable(ftpdet, locdata=locdata, cache=cache)
+
+
+def _getStationLocation(ftpdetectinfo_file_name, locdata=None):
+    """ Internal function to get the station id, lat, lon and elevation (degrees, metres) for an 
+    FTPDetect file, either from locdata or from the shared StationLocations registry  
+
+    Returns None if the location can't be determined.  
+    """
+    if locdata is None:
+        locdata = stationLocations.get(ftpdetectinfo_file_name)
+        if locdata is None:
+            return None
+    return locdata['station_code'], float(locdata['lat']), float(locdata['lon']), float(locdata['elev'])
+
+
+def _readStationLocation(dirname, statid):
+    """ Internal function to read a camera location from the .config or platepars file in dirname  
+    """
+    cfgfile = os.path.join(dirname, '.config')
+    cfg = crp.ConfigParser()
+    cfg.read(cfgfile)
+    try: 
+        lat = float(cfg['System']['latitude'].split()[0])
+        lon = float(cfg['System']['longitude'].split()[0])
+        height = float(cfg['System']['elevation'].split()[0])
+    except Exception:
+        # try reading from platepars file
+        ppf = os.path.join(dirname, 'platepars_all_recalibrated.json')
+        if not os.path.isfile(ppf):
+            return None
+        # only the first entry is needed, but there must be at least ten for the file to be trusted
+        entries = list(_iterJsonEntries(ppf, maxentries=10))
+        if len(entries) < 10:
+            return None
+        pp = entries[0][1]
+        lat = pp['lat']
+        lon = pp['lon']
+        height = pp['elev']
+    return {'station_code': statid, 'lat': lat, 'lon': lon, 'elev': height}
+
+
+def _iterJsonEntries(jsonfile, maxentries=None, chunksize=65536):
+    """ Internal generator that yields the (key, value) pairs of a top-level JSON object one at a time, 
+    reading the file in chunks rather than loading it all, and stopping after maxentries.  
+    """
+    decoder = json.JSONDecoder()
+    count = 0
+    with open(jsonfile, 'r') as inf:
+        buf = inf.read(chunksize)
+        eof = len(buf) < chunksize
+        pos = buf.find('{') + 1
+        if pos == 0:
+            return
+        while maxentries is None or count < maxentries:
+            try:
+                # skip separators and whitespace then decode "key": value
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buf) and buf[pos] == '}':
+                    return
+                key, kend = decoder.raw_decode(buf, pos)
+                colon = buf.index(':', kend)
+                vstart = colon + 1
+                while vstart < len(buf) and buf[vstart] in ' \t\r\n':
+                    vstart += 1
+                val, pos = decoder.raw_decode(buf, vstart)
+            except ValueError:
+                # entry incomplete, so read more of the file
+                if eof:
+                    return
+                more = inf.read(chunksize)
+                eof = len(more) < chunksize
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            count += 1
+            yield key, val
+
+
+class StationLocations(object):
+    """ Registry of camera locations, read from the .config or platepars file in each RMS data folder 
+    and remembered so that each folder is only read once. An entry is re-read if the .config or platepars 
+    file changes.  
+
+    A shared instance, stationLocations, is used by the FTPDetect loaders when locdata is not supplied.  
+
+    Example:  
+        locdata = stationLocations.get(ftpfile)  
+        mets = loadFTPDetectInfo(ftpfile, locdata=locdata)  
+    """
+    def __init__(self):
+        self.locations = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ftpdetectinfo_file_name):
+        """ Get the location of the camera that created an FTPDetect file  
+
+        Arguments:  
+            ftpdetectinfo_file_name: [str] Path to the FTPdetectinfo file.  
+
+        Returns:  
+            a dict of station_code, lat, lon (degrees) and elev (metres), suitable for passing as locdata, 
+            or None if the location can't be found.  
+        """
+        dirname, fname = os.path.split(ftpdetectinfo_file_name)
+        statid = fname.split('_')[1]
+        key = (statid, os.path.abspath(dirname))
+        stamp = tuple(_fileStamp(os.path.join(dirname, f)) for f in ['.config', 'platepars_all_recalibrated.json'])
+        cached = self.locations.get(key)
+        if cached is not None and cached[0] == stamp:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        loc = _readStationLocation(dirname, statid)
+        self.locations[key] = (stamp, loc)
+        return loc
+
+    def clear(self):
+        """ Forget all the saved locations """
+        self.locations = {}
+        self.hits = 0
+        self.misses = 0
+
+
+def _fileStamp(fname):
+    """ Internal function returning the mtime and size of a file, or None if it doesn't exist  
+    """
+    try:
+        st = os.stat(fname)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+stationLocations = StationLocations()
+"""Shared StationLocations registry used by the FTPDetect loaders"""
+
+
+def _ffNameToJD(ff_name):
+    """ Internal function to extract the reference julian date from an FF file name  
+    """
+    line = ff_name.split('_')
+
+    # Count the number of string segments, and determine if it the old or new CAMS format
+    if len(line) == 6:
+        sc = 1
+    else:
+        sc = 0
+
+    ff_date = line[1 + sc]
+    ff_time = line[2 + sc]
+    milliseconds = line[3 + sc]
+
+    year = ff_date[:4]
+    month = ff_date[4:6]
+    day = ff_date[6:8]
+
+    hour = ff_time[:2]
+    minute = ff_time[2:4]
+    seconds = ff_time[4:6]
+
+    year, month, day, hour, minute, seconds, milliseconds = map(int, [year, month, day, hour, 
+        minute, seconds, milliseconds])
+
+    return date2JD(year, month, day, hour, minute, seconds, milliseconds)
+
+
+def _ffFrameNo(ff_name):
+    """ Internal function to extract the frame number at the start of an FF file from its name  
+    """
+    return int(ff_name.split("_")[-1].split('.')[0])
+
+
+def _canJoin(met1, met2):
+    """ Internal function to test if met2 is the continuation of met1 into the next FF file  
+    """
+    # Compare only same station observations
+    if met1.station_id != met2.station_id:
+        return False
+
+    # Skip if the next FF is not exactly 256 frames later
+    if _ffFrameNo(met2.ff_name) != (_ffFrameNo(met1.ff_name) + 256):
+        return False
+
+    # Check for frame continouty
+    if (met1.frames[-1] < 254) or (met2.frames[0] > 2):
+        return False
+
+    # Check if the next frame is close to the predicted position 
+
+    # Compute angular distance between the last 2 points on the first FF
+    ang_dist = angleBetweenSphericalCoords(met1.dec_data[-2], met1.ra_data[-2], met1.dec_data[-1],
+        met1.ra_data[-1])
+
+    # Compute frame difference between the last frame on the 1st FF and the first frame on the 2nd FF
+    df = met2.frames[0] + (256 - met1.frames[-1])
+
+    # Skip the pair if the angular distance between the last and first frames is 2x larger than the 
+    #   frame difference times the expected separation
+    ang_dist_between = angleBetweenSphericalCoords(met1.dec_data[-1], met1.ra_data[-1],
+        met2.dec_data[0], met2.ra_data[0])
+
+    if ang_dist_between > 2*df*ang_dist:
+        return False
+    return True
+
+
+def _mergeChain(chain):
+    """ Internal function to merge a chain of meteor segments from consecutive FF files into the 
+    first segment, concatenating each data array once  
+    """
+    met1 = chain[0]
+    if len(chain) == 1:
+        return met1
+
+    # frames in the k'th segment are offset by 256*k from the start of the first FF
+    frames = np.concatenate([met.frames + 256.0*k for k, met in enumerate(chain)])
+    met1.frames = frames
+    met1.time_data = frames/met1.fps
+    met1.x_data = np.concatenate([met.x_data for met in chain])
+    met1.y_data = np.concatenate([met.y_data for met in chain])
+    met1.azim_data = np.concatenate([met.azim_data for met in chain])
+    met1.elev_data = np.concatenate([met.elev_data for met in chain])
+    met1.ra_data = np.concatenate([met.ra_data for met in chain])
+    met1.dec_data = np.concatenate([met.dec_data for met in chain])
+    met1.mag_data = np.concatenate([met.mag_data for met in chain])
+
+    # Merge the FF file names into a comma-separated list
+    if all(met.ff_name is not None for met in chain):
+        met1.ff_name = ','.join([met.ff_name for met in chain])
+
+    # Sort all observations by time
+    met1._finish()
+    return met1
+
+
+def _joinBrokenMeteors(meteor_list):
+    """ Internal function to join meteors broken across two or more consecutive FF files. 
+    Meteors are indexed by station and FF start frame so each one's continuation can be looked up directly.  
+    """
+    ff_index = {}
+    frame_nos = []
+    for i, met in enumerate(meteor_list):
+        frame_no = _ffFrameNo(met.ff_name)
+        frame_nos.append(frame_no)
+        ff_index.setdefault((met.station_id, frame_no), []).append(i)
+
+    # start chains from the earliest segments, so that out-of-order input still joins from the head of
+    # each chain and no segment is used twice
+    consumed = set()
+    joined = []
+    for i in sorted(range(len(meteor_list)), key=lambda k: (str(meteor_list[k].station_id), frame_nos[k])):
+        if i in consumed:
+            continue
+        consumed.add(i)
+        met = meteor_list[i]
+        chain = [met]
+        frame_no = frame_nos[i]
+        # follow the chain into later FF files for as long as a continuation exists
+        while True:
+            nxt = None
+            for j in ff_index.get((met.station_id, frame_no + 256), []):
+                if j not in consumed and _canJoin(chain[-1], meteor_list[j]):
+                    nxt = j
+                    break
+            if nxt is None:
+                break
+            consumed.add(nxt)
+            chain.append(meteor_list[nxt])
+            frame_no = frame_nos[nxt]
+        joined.append((i, _mergeChain(chain)))
+
+    # return the meteors in the order of the first segment of each in the input
+    return [met for _, met in sorted(joined, key=lambda x: x[0])]
+
+
+def _joinBrokenStream(meteors, window=32):
+    """ Internal generator to join meteors broken across consecutive FF files. Up to window chains of 
+    segments are held back, indexed by station and the FF start frames of their first and last segments, 
+    so a segment can join a chain read earlier whichever order the two are in. Chains are yielded in 
+    the order they were started once more than window are held, or at the end of the file.  
+    """
+    chains = {}
+    heads = {}
+    tails = {}
+    nextid = 0
+
+    def _find(index, key, test):
+        for cid in index.get(key, []):
+            if test(chains[cid]):
+                return cid
+        return None
+
+    def _drop(index, key, cid):
+        index[key].remove(cid)
+        if len(index[key]) == 0:
+            del index[key]
+
+    def _ends(chain):
+        return (chain[0].station_id, _ffFrameNo(chain[0].ff_name)), \
+            (chain[-1].station_id, _ffFrameNo(chain[-1].ff_name))
+
+    try:
+        for met in meteors:
+            station_id, frame_no = met.station_id, _ffFrameNo(met.ff_name)
+            # the continuation of a chain ending in the previous FF file
+            cid = _find(tails, (station_id, frame_no - 256), lambda chain: _canJoin(chain[-1], met))
+            if cid is not None:
+                _drop(tails, (station_id, frame_no - 256), cid)
+                chains[cid].append(met)
+                # the segment may also bridge the gap to a chain starting in the next FF file
+                nid = _find(heads, (station_id, frame_no + 256), lambda chain: _canJoin(met, chain[0]))
+                if nid is not None:
+                    head, tail = _ends(chains[nid])
+                    _drop(heads, head, nid)
+                    _drop(tails, tail, nid)
+                    chains[cid].extend(chains.pop(nid))
+                tails.setdefault(_ends(chains[cid])[1], []).append(cid)
+            else:
+                # or the start of a chain beginning in the next FF file
+                cid = _find(heads, (station_id, frame_no + 256), lambda chain: _canJoin(met, chain[0]))
+                if cid is not None:
+                    _drop(heads, (station_id, frame_no + 256), cid)
+                    chains[cid].insert(0, met)
+                else:
+                    cid = nextid
+                    nextid += 1
+                    chains[cid] = [met]
+                    tails.setdefault((station_id, frame_no), []).append(cid)
+                heads.setdefault((station_id, frame_no), []).append(cid)
+
+            while len(chains) > window:
+                cid = next(iter(chains))
+                head, tail = _ends(chains[cid])
+                _drop(heads, head, cid)
+                _drop(tails, tail, cid)
+                yield _mergeChain(chains.pop(cid))
+        for chain in chains.values():
+            yield _mergeChain(chain)
+    finally:
+        meteors.close()
 
 
 def _writeFTPHeader(ftpf, metcount, fldr, ufo=True):
     """
     Internal function to create the header of the FTPDetect file  
     """
-    l1 = 'Meteor Count = {:06d}\n'.format(metcount)
-    ftpf.write(l1)
-    ftpf.write('-----------------------------------------------------\n')
+    ftpf.write(_formatFTPHeader(metcount, fldr, ufo))
+
+
+def _formatFTPHeader(metcount, fldr, ufo=True):
+    """
+    Internal function to format the header of the FTPDetect file as a string  
+    """
+    lines = ['Meteor Count = {:06d}\n'.format(metcount), 
+        '-----------------------------------------------------\n']
     if ufo is True:
-        ftpf.write('Processed with UFOAnalyser\n')
+        lines.append('Processed with UFOAnalyser\n')
     else:
-        ftpf.write('Processed with RMS 1.0\n')
-    ftpf.write('-----------------------------------------------------\n')
-    l1 = 'FF  folder = {:s}\n'.format(fldr)
-    ftpf.write(l1)
-    l1 = 'CAL folder = {:s}\n'.format(fldr)
-    ftpf.write(l1)
-    ftpf.write('-----------------------------------------------------\n')
-    ftpf.write('FF  file processed\n')
-    ftpf.write('CAL file processed\n')
-    ftpf.write('Cam# Meteor# #Segments fps hnr mle bin Pix/fm Rho Phi\n')
-    ftpf.write('Per segment:  Frame# Col Row RA Dec Azim Elev Inten Mag\n')
+        lines.append('Processed with RMS 1.0\n')
+    lines.append('-----------------------------------------------------\n')
+    lines.append('FF  folder = {:s}\n'.format(fldr))
+    lines.append('CAL folder = {:s}\n'.format(fldr))
+    lines.append('-----------------------------------------------------\n')
+    lines.append('FF  file processed\n')
+    lines.append('CAL file processed\n')
+    lines.append('Cam# Meteor# #Segments fps hnr mle bin Pix/fm Rho Phi\n')
+    lines.append('Per segment:  Frame# Col Row RA Dec Azim Elev Inten Mag\n')
+    return ''.join(lines)
 
 
 def _writeOneMeteor(ftpf, metno, sta, evttime, fcount, fps, fno, ra, dec, az, alt, b, mag, 
         ufo=True, x=None, y=None, ffname = None):
     """   Internal function to write one meteor event into the file in FTPDetectInfo style
     """
-    ftpf.write('-------------------------------------------------------\n')
+    ftpf.write(_formatOneMeteor(metno, sta, evttime, fcount, fps, fno, ra, dec, az, alt, b, mag, 
+        ufo, x, y, ffname))
+
+
+def _formatOneMeteor(metno, sta, evttime, fcount, fps, fno, ra, dec, az, alt, b, mag, 
+        ufo=True, x=None, y=None, ffname=None, procdt=None):
+    """   Internal function to format one meteor event in FTPDetectInfo style. The data lines are 
+    formatted in a single operation.  
+    """
+    out = ['-------------------------------------------------------\n']
     if ffname is None:
         ms = '{:03d}'.format(int(evttime.microsecond / 1000))
 
         fname = 'FF_' + sta + '_' + evttime.strftime('%Y%m%d_%H%M%S_') + ms + '_0000000.fits\n'
     else:
         fname = ffname + '\n'
-    ftpf.write(fname)
+    out.append(fname)
 
     if ufo is True:
-        ftpf.write('UFO UKMON DATA Recalibrated on: ')
+        out.append('UFO UKMON DATA Recalibrated on: ')
     else:
-        ftpf.write('RMS data reprocessed on: ')
-    ftpf.write(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f UTC\n'))
-    li = f'{sta} {metno:04d} {fcount:04d} {fps:04.2f} 000.0 000.0  00.0 000.0 0000.0 0000.0\n'
-    ftpf.write(li)
-
-    for i in range(len(fno)):
-        #    204.4909 0422.57 0353.46 262.3574 +16.6355 267.7148 +23.0996 000120 3.41
-        bri = 0
-        if b is not None:
-            bri = int(b[i])
-        if ufo is True:
-            # UFO is timestamped as at the first detection
-            thisfn = fno[i] - fno[0]
-            thisx = 0
-            thisy = 0
-        else:
-            thisfn = fno[i]
-            thisx = x[i]
-            thisy = y[i]
-        li = f'{thisfn:.4f} {thisx:07.2f} {thisy:07.2f} '
-        li = li + f'{ra[i]:8.4f} {dec[i]:+7.4f} {az[i]:8.4f} '
-        li = li + f'{alt[i]:+7.4f} {bri:06d} {mag[i]:.02f}\n'
-        ftpf.write(li)
+        out.append('RMS data reprocessed on: ')
+    if procdt is None:
+        procdt = datetime.datetime.now()
+    out.append(procdt.strftime('%Y-%m-%d %H:%M:%S.%f UTC\n'))
+    out.append(f'{sta} {metno:04d} {fcount:04d} {fps:04.2f} 000.0 000.0  00.0 000.0 0000.0 0000.0\n')
+
+    npts = len(fno)
+    if npts == 0:
+        return ''.join(out)
+    #    204.4909 0422.57 0353.46 262.3574 +16.6355 267.7148 +23.0996 000120 3.41
+    fno = np.asarray(fno, dtype=np.float64)
+    if b is None:
+        bri = np.zeros(npts, dtype=np.int64)
+    else:
+        bri = np.asarray(b).astype(np.int64)
+    if ufo is True:
+        # UFO is timestamped as at the first detection
+        thisfn = fno - fno[0]
+        thisx = np.zeros(npts)
+        thisy = np.zeros(npts)
+    else:
+        thisfn = fno
+        thisx = x
+        thisy = y
+    vals = np.empty((npts, 9), dtype=object)
+    for col, arr in enumerate([thisfn, thisx, thisy, ra, dec, az, alt]):
+        vals[:, col] = np.asarray(arr, dtype=np.float64)
+    vals[:, 7] = bri
+    vals[:, 8] = np.asarray(mag, dtype=np.float64)
+    rowfmt = '%.4f %07.2f %07.2f %8.4f %+7.4f %8.4f %+7.4f %06d %.2f\n'
+    out.append((rowfmt * npts) % tuple(vals.ravel()))
+    return ''.join(out)
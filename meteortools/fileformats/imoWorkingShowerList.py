@@ -8,11 +8,14 @@ import datetime
 import os
 import numpy as np
 import copy
+import types
+import hashlib
+import pickle
 
 try:
-    from ..utils import jd2Date, sollon2jd
+    from ..utils import jd2Date, sollon2jd, jd2sollon, datetime64ToJD, getCacheDir
 except Exception:
-    from meteortools.utils import jd2Date, sollon2jd
+    from meteortools.utils import jd2Date, sollon2jd, jd2sollon, datetime64ToJD, getCacheDir
 
 # imported from $SRC/share
 try:
@@ -42,75 +45,85 @@ class IMOshowerList:
                 datadir=os.path.split(os.path.abspath(__file__))[0]
                 fname = os.path.join(datadir, '..', 'share', 'IMO_Working_Meteor_Shower_List.xml')
         
-        tmplist = xmltodict.parse(open(fname, 'rb').read())
-        self.showerlist = tmplist['meteor_shower_list']['shower']
+        self.showerlist = _loadShowerList(fname)
         if fullstreamname is None:
             fullstreamname = os.path.join(datadir, 'share', 'streamfulldata.npy')
             if not os.path.isfile(fullstreamname):
                 datadir=os.path.split(os.path.abspath(__file__))[0]
                 fullstreamname = os.path.join(datadir, '..', 'share', 'streamfulldata.npy')
         self.fullstreamdata = np.load(fullstreamname)
+
+        # indexes by IAU code, so lookups don't need to scan the lists. If a code appears more than
+        # once in the working list, the last entry is used. The list may be shared, see getIMOshowerList,
+        # so the indexes are read-only
+        self.showerindex = types.MappingProxyType({shower['IAU_code']: types.MappingProxyType(shower) 
+            for shower in self.showerlist})
+        streamindex = {}
+        for i, code in enumerate(self.fullstreamdata[:,3]):
+            streamindex.setdefault(code, []).append(i)
+        self.streamindex = types.MappingProxyType({code: tuple(idx) for code, idx in streamindex.items()})
+        self._clearCache()
         #print('initialised')
 
+    def _clearCache(self):
+        """ Forget the resolved showers and dates. The IAU-only peak dates depend on the current month,  
+        so the cache is cleared when that changes.  
+        """
+        self._cachemonth = datetime.datetime.now().strftime('%Y%m')
+        self._showercache = {}
+        self._datecache = {}
+        self._activityindex = {}
+
+    def _checkCache(self):
+        if datetime.datetime.now().strftime('%Y%m') != self._cachemonth:
+            self._clearCache()
+
     
     def getShowerByCode(self, iaucode, useFull=False):
+        self._checkCache()
+        key = (iaucode, useFull)
+        if key not in self._showercache:
+            self._showercache[key] = self._resolveShower(iaucode, useFull)
+        # return a copy, so that callers can't change the cached details for everyone else
+        return dict(self._showercache[key])
+
+    def _resolveShower(self, iaucode, useFull):
         ds = {'@id':None, 'IAU_code':None,'start':None, 'end':None, 
             'peak':None, 'r':None, 'name':None, 'V':None, 'ZHR':None, 'RA':None, 'DE':None, 'pksollon': None}
         ds2 = {'@id':None, 'IAU_code':None,'start':None, 'end':None, 
             'peak':None, 'r':None, 'name':None, 'V':None, 'ZHR':None, 'RA':None, 'DE':None, 'pksollon': None}
-        for shower in self.showerlist:
-            if shower['IAU_code'] == iaucode:
-                ds = shower
+        if iaucode in self.showerindex:
+            ds = dict(self.showerindex[iaucode])
         if ds['@id'] is None:
             ds['@id'] = -1
         pksollong = -1
         #print(ds)
-        subset = self.fullstreamdata[np.where(self.fullstreamdata[:,3]==iaucode)]
+        subset = self.fullstreamdata[list(self.streamindex.get(iaucode, ()))]
         if subset is not None:
             mtch = [sh for sh in subset if int(sh[6]) > -1]
-            if len(mtch) > 0:
-                ds2 = copy.deepcopy(ds)
-                ds2['IAU_code'] = mtch[-1][3].strip()
-                ds2['name'] = mtch[-1][4].strip()
-                ds2['V'] = mtch[-1][12]
-                ds2['@id'] = mtch[-1][1]
-                ds2['RA'] = mtch[-1][8]
-                ds2['DE'] = mtch[-1][9]
-
-                pksollong = float(mtch[-1][7])
-                dt = datetime.datetime.now()
-                yr = dt.year
-                mth = dt.month
-                jd = sollon2jd(yr, mth, pksollong)
-                pkdt = jd2Date(jd, dt_obj=True)
-                ds2['peak'] = pkdt.strftime('%h %d')
-                # start/end pop idx, ZHR not available in the IAU data
-                ds2['start'] = (pkdt + datetime.timedelta(days=-2)).strftime('%h %d')
-                ds2['end'] = (pkdt + datetime.timedelta(days=2)).strftime('%h %d')
-                ds2['pksollon'] = pksollong
-                #print(ds2)
-            else:
+            if len(mtch) == 0:
                 # okay so its poor quality but lets try it anyway
                 mtch = subset
-                ds2 = copy.deepcopy(ds)
-                ds2['IAU_code'] = mtch[-1][3].strip()
-                ds2['name'] = mtch[-1][4].strip()
-                ds2['V'] = mtch[-1][12]
-                ds2['@id'] = mtch[-1][1]
-                ds2['RA'] = mtch[-1][8]
-                ds2['DE'] = mtch[-1][9]
-
-                pksollong = float(mtch[-1][7])
-                dt = datetime.datetime.now()
-                yr = dt.year
-                mth = dt.month
-                jd = sollon2jd(yr, mth, pksollong)
-                pkdt = jd2Date(jd, dt_obj=True)
-                ds2['peak'] = pkdt.strftime('%h %d')
-                # start/end pop idx, ZHR not available in the IAU data
-                ds2['start'] = (pkdt + datetime.timedelta(days=-2)).strftime('%h %d')
-                ds2['end'] = (pkdt + datetime.timedelta(days=2)).strftime('%h %d')
-                ds2['pksollon'] = pksollong
+            ds2 = copy.deepcopy(ds)
+            ds2['IAU_code'] = mtch[-1][3].strip()
+            ds2['name'] = mtch[-1][4].strip()
+            ds2['V'] = mtch[-1][12]
+            ds2['@id'] = mtch[-1][1]
+            ds2['RA'] = mtch[-1][8]
+            ds2['DE'] = mtch[-1][9]
+
+            pksollong = float(mtch[-1][7])
+            dt = datetime.datetime.now()
+            yr = dt.year
+            mth = dt.month
+            jd = sollon2jd(yr, mth, pksollong)
+            pkdt = jd2Date(jd, dt_obj=True)
+            ds2['peak'] = pkdt.strftime('%h %d')
+            # start/end pop idx, ZHR not available in the IAU data
+            ds2['start'] = (pkdt + datetime.timedelta(days=-2)).strftime('%h %d')
+            ds2['end'] = (pkdt + datetime.timedelta(days=2)).strftime('%h %d')
+            ds2['pksollon'] = pksollong
+            #print(ds2)
         if useFull is False:
             if 'pksollon' not in ds:
                 ds['pksollon'] = ds2['pksollon']
@@ -125,8 +138,28 @@ class IMOshowerList:
             ds2['r'] = ds['r']
             return ds2
 
+    def _showerDates(self, iaucode, year):
+        """ Start, end and peak dates of a shower in a given year, worked out once and then remembered  
+        """
+        self._checkCache()
+        key = (iaucode, year)
+        if key not in self._datecache:
+            shower = self.getShowerByCode(iaucode)
+            peakdate = datetime.datetime.strptime(shower['peak'], '%b %d') if shower['peak'] is not None else None
+            if shower['start'] is not None:
+                startdate = datetime.datetime.strptime(shower['start'], '%b %d')
+            else:
+                startdate = peakdate + datetime.timedelta(days=-3)
+            if shower['end'] is not None:
+                enddate = datetime.datetime.strptime(shower['end'], '%b %d')
+            else:
+                enddate = peakdate + datetime.timedelta(days=3)
+            if peakdate is not None:
+                peakdate = peakdate.replace(year=year)
+            self._datecache[key] = (startdate.replace(year=year), enddate.replace(year=year), peakdate)
+        return self._datecache[key]
+
     def getStart(self, iaucode, currdt=None):
-        shower = self.getShowerByCode(iaucode)
         if currdt is None:
             now = datetime.datetime.today().year
             mth = datetime.datetime.today().month
@@ -134,18 +167,12 @@ class IMOshowerList:
             now = datetime.datetime.strptime(str(currdt), '%Y%m%d')
             mth = now.month
             now = now.year
-        if shower['start'] is not None:
-            startdate = datetime.datetime.strptime(shower['start'], '%b %d')
-        else:
-            startdate = datetime.datetime.strptime(shower['peak'], '%b %d') + datetime.timedelta(days=-3)
         if iaucode == 'QUA' and mth !=12:
             # quadrantids straddle yearend
             now = now - 1
-        startdate = startdate.replace(year=now)
-        return startdate
+        return self._showerDates(iaucode, now)[0]
 
     def getEnd(self, iaucode, currdt=None):
-        shower = self.getShowerByCode(iaucode)
         if currdt is None:
             now = datetime.datetime.today().year
             mth = datetime.datetime.today().month
@@ -153,19 +180,12 @@ class IMOshowerList:
             now = datetime.datetime.strptime(str(currdt), '%Y%m%d')
             mth = now.month
             now = now.year
-        #print(shower)
-        if shower['end'] is not None:
-            enddate = datetime.datetime.strptime(shower['end'], '%b %d')
-        else:
-            enddate = datetime.datetime.strptime(shower['peak'], '%b %d') + datetime.timedelta(days=3)
         if iaucode == 'QUA' and mth == 12:
             # quadrantids straddle yearend
             now = now + 1
-        enddate = enddate.replace(year=now)
-        return enddate
+        return self._showerDates(iaucode, now)[1]
 
     def getPeak(self, iaucode, currdt=None):
-        shower = self.getShowerByCode(iaucode)
         if currdt is None:
             now = datetime.datetime.today().year
             mth = datetime.datetime.today().month
@@ -173,12 +193,10 @@ class IMOshowerList:
             now = datetime.datetime.strptime(str(currdt), '%Y%m%d')
             mth = now.month
             now = now.year
-        enddate = datetime.datetime.strptime(shower['peak'], '%b %d')
         if iaucode == 'QUA' and mth == 12:
             # quadrantids straddle yearend
             now = now + 1
-        enddate = enddate.replace(year=now)
-        return enddate
+        return self._showerDates(iaucode, now)[2]
 
     def getRvalue(self, iaucode):
         shower = self.getShowerByCode(iaucode)
@@ -220,6 +238,63 @@ class IMOshowerList:
                     activelist.append(shwname)
         return activelist
 
+    def getActiveShowersForDates(self, dates, majorOnly=False, inclMinor=False):
+        """ Return the showers active on each of many dates, in one pass. The activity windows are 
+        compared in solar longitude, so windows that run over the end of the year are handled.  
+
+        Arguments:  
+            dates: [list] datetimes, or a numpy datetime64 array or pandas Series  
+
+        Keyword Arguments:  
+            majorOnly: [bool] only return major showers. Default False.  
+            inclMinor: [bool] if majorOnly is True, also return the minor showers. Default False.  
+
+        Returns:  
+            a list with one list of shower codes for each date  
+        """
+        dates = np.atleast_1d(np.asarray(dates, dtype='datetime64[us]'))
+        sollon = np.atleast_1d(jd2sollon(datetime64ToJD(dates)))
+        years = dates.astype('datetime64[Y]').astype(int) + 1970
+        # windows that run over the new year are taken as ending in the date's year for dates in the 
+        # first half of the year, and as starting in it for the second half
+        early = (dates.astype('datetime64[M]').astype(int) % 12) < 6
+        codes = self._getActivityIndex(int(years[0]), True)[0] if len(dates) > 0 else np.array([])
+        active = np.zeros((len(dates), len(codes)), dtype=bool)
+        for year, isearly in set(zip(years.tolist(), early.tolist())):
+            _, startsl, endsl = self._getActivityIndex(year, isearly)
+            rows = (years == year) & (early == isearly)
+            sl = sollon[rows][:, np.newaxis]
+            active[rows] = np.where(startsl <= endsl, (sl > startsl) & (sl < endsl), (sl > startsl) | (sl < endsl))
+        if majorOnly is True:
+            wanted = np.array([c in majorlist or (inclMinor is True and c in minorlist) for c in codes], dtype=bool)
+            active &= wanted
+        return [codes[row].tolist() for row in active]
+
+    def _getActivityIndex(self, year, early):
+        """ Internal function returning arrays of shower codes and the solar longitudes at which they 
+        start and end in a given year, built once and then remembered. The end is extended by three 
+        days, as in getActiveShowers. Windows that run over the new year end in the given year if 
+        early is True, or start in it if not.  
+        """
+        self._checkCache()
+        if (year, early) not in self._activityindex:
+            codes = [shower['IAU_code'] for shower in self.showerlist if shower['IAU_code'] != 'ANT']
+            # remove duplicates but keep the order of the list
+            codes = list(dict.fromkeys(codes))
+            starts, ends = [], []
+            for code in codes:
+                startdate, enddate, _ = self._showerDates(code, year)
+                if enddate < startdate and early:
+                    startdate = startdate.replace(year=year - 1)
+                elif enddate < startdate:
+                    enddate = enddate.replace(year=year + 1)
+                starts.append(startdate)
+                ends.append(enddate + datetime.timedelta(days=3))
+            startsl = jd2sollon(datetime64ToJD(np.array(starts, dtype='datetime64[us]')))
+            endsl = jd2sollon(datetime64ToJD(np.array(ends, dtype='datetime64[us]')))
+            self._activityindex[(year, early)] = (np.array(codes), startsl, endsl)
+        return self._activityindex[(year, early)]
+
     def getMajorShowers(self, includeSpo=False, stringFmt=False):
         majlist = majorlist 
         if includeSpo is True:
@@ -230,3 +305,60 @@ class IMOshowerList:
                 tmplist = tmplist + shwr + ' '
             majlist = tmplist
         return majlist
+
+
+_sharedLists = {}
+
+
+def getIMOshowerList(fname=None, fullstreamname=None):
+    """
+    Return a shared IMOshowerList, creating it the first time it's needed. Later calls with the same 
+    arguments return the same object, so the shower files are only read once per process.  
+
+    Keyword Arguments:  
+        fname:          [str] the IMO working list XML file. Default None, the bundled file.  
+        fullstreamname: [str] the IAU stream data file. Default None, the bundled file.  
+
+    Returns:  
+        an IMOshowerList  
+    """
+    key = (fname, fullstreamname)
+    if key not in _sharedLists:
+        _sharedLists[key] = IMOshowerList(fname, fullstreamname)
+    return _sharedLists[key]
+
+
+def _loadShowerList(fname):
+    """ Internal function to read the shower list from the XML file. The parsed list is saved in a 
+    snapshot file in the user's cache folder (see utils.getCacheDir), along with the XML's hash, and the 
+    snapshot is used instead of parsing the XML for as long as the hash matches.  
+    """
+    rawxml = open(fname, 'rb').read()
+    xmlhash = hashlib.sha256(rawxml).hexdigest()
+    snapname, tmpname = None, None
+    try:
+        snapname = _snapshotName(fname)
+        with open(snapname, 'rb') as inf:
+            snap = pickle.load(inf)
+        if snap['hash'] == xmlhash:
+            return snap['showerlist']
+    except Exception:
+        pass
+    showerlist = xmltodict.parse(rawxml)['meteor_shower_list']['shower']
+    try:
+        # write to a temporary file first so other processes never see a partial snapshot
+        tmpname = f'{snapname}.{os.getpid()}'
+        with open(tmpname, 'wb') as outf:
+            pickle.dump({'hash': xmlhash, 'showerlist': showerlist}, outf, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, snapname)
+    except Exception:
+        # the cache may not be writeable, in which case we just parse the XML every time
+        if tmpname is not None and os.path.isfile(tmpname):
+            os.remove(tmpname)
+    return showerlist
+
+
+def _snapshotName(fname):
+    """ Internal function to get the snapshot file for an XML file, one per XML file path """
+    pathhash = hashlib.sha256(os.path.abspath(fname).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(getCacheDir(), f'showerlist-{pathhash}.snap')
@@ -15,10 +15,20 @@ Require WMPL:
 
 """
 
-from .multiDayRadiant import multiDayRadiant
-from .analyseUFOwithRMS import analyseUFOwithRMS
-from .multiEventGroundMap import multiEventGroundMap
-from .plotCAMSOrbits import plotCAMSOrbits
-from .plotRMSOrbits import plotRMSOrbits
-from .pickleToKml import pickleToKml
-from .pickleToKml import pickleTo2dTrack
+try:
+    from ..utils.lazyImport import lazyPackage
+except Exception:
+    from meteortools.utils.lazyImport import lazyPackage
+
+# the submodules are only imported when one of their functions is first used, so importing the
+# package does not load libraries that are not needed
+_submodules = {
+    'multiDayRadiant': ['multiDayRadiant'],
+    'analyseUFOwithRMS': ['analyseUFOwithRMS'],
+    'multiEventGroundMap': ['multiEventGroundMap'],
+    'plotCAMSOrbits': ['plotCAMSOrbits'],
+    'plotRMSOrbits': ['plotRMSOrbits'],
+    'pickleToKml': ['pickleToKml', 'pickleTo2dTrack'],
+}
+__all__ = [name for names in _submodules.values() for name in names]
+__getattr__, __dir__ = lazyPackage(__name__, {name: mod for mod, names in _submodules.items() for name in names})
@@ -68,7 +68,7 @@ def multiEventGroundMap(startdt, enddt, statid=None, shwr=None, outdir=None, min
         obslat = float(obslat)
         obslon = float(obslon)
         evtdist = float(evtdist)
-        dta['evtdist'] = [greatCircleDistance(obslat/RAD2DEG, obslon/RAD2DEG, x/RAD2DEG,y/RAD2DEG) for x,y in zip(dta._lat2, dta._lng2)]
+        dta['evtdist'] = greatCircleDistance(obslat/RAD2DEG, obslon/RAD2DEG, dta._lat2/RAD2DEG, dta._lng2/RAD2DEG)
         dta = dta[dta.evtdist <= evtdist]
 
     if len(dta) > 1:
@@ -0,0 +1,193 @@
+# Copyright (C) 2018-2023 Mark McIntyre
+#
+# benchmarks for the coordinate and time maths in utils.Math
+#
+# usage:
+#   python benchmarkMath.py run -o before.json
+#   python benchmarkMath.py run -o after.json
+#   python benchmarkMath.py compare before.json after.json -t 0.2
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+# benchmark the source tree this script is in rather than any installed copy
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from meteortools.utils.Math import date2JD, jd2Date, jd2LST, raDec2AltAz, altAz2RADec, \
+    raDec2AltAz_vect, altAz2RADec_vect, equatorialCoordPrecession, equatorialCoordPrecession_vect, \
+    greatCircleDistance, angleBetweenSphericalCoords, datetime64ToJD, jdToDatetime64  # noqa: E402
+
+SEED = 20230423
+SIZES = [1, 1000, 1000000]
+LAT = np.radians(51.88310)
+LON = np.radians(-1.30616)
+J2000 = 2451545.0
+
+
+def _makeData(n):
+    """ Create the input data for n elements, always the same for a given n """
+    rng = np.random.default_rng(SEED)
+    jd = 2459945.5 + rng.uniform(0, 365, n)
+    return {
+        'jd': jd,
+        'dt64': jdToDatetime64(jd),
+        'dates': [jd2Date(j) for j in jd],
+        'ra': rng.uniform(0, 2*np.pi, n),
+        'dec': np.arcsin(rng.uniform(-1, 1, n)),
+        'az': rng.uniform(0, 2*np.pi, n),
+        'alt': rng.uniform(0, np.pi/2, n),
+        'lat2': np.arcsin(rng.uniform(-1, 1, n)),
+        'lon2': rng.uniform(-np.pi, np.pi, n),
+    }
+
+
+def _scalarCases(d):
+    """ The scalar benchmarks. Each calls the function once per element, as callers currently do """
+    jd, ra, dec, az, alt = d['jd'].tolist(), d['ra'].tolist(), d['dec'].tolist(), d['az'].tolist(), d['alt'].tolist()
+    lat2, lon2 = d['lat2'].tolist(), d['lon2'].tolist()
+    dates = d['dates']
+    return {
+        'date2JD': lambda: [date2JD(*dt) for dt in dates],
+        'jd2Date': lambda: [jd2Date(j, dt_obj=True) for j in jd],
+        'jd2LST': lambda: [jd2LST(j, -1.30616) for j in jd],
+        'raDec2AltAz': lambda: [raDec2AltAz(r, de, j, LAT, LON) for r, de, j in zip(ra, dec, jd)],
+        'altAz2RADec': lambda: [altAz2RADec(a, e, j, LAT, LON) for a, e, j in zip(az, alt, jd)],
+        'equatorialCoordPrecession': lambda: [equatorialCoordPrecession(J2000, j, r, de) for r, de, j in zip(ra, dec, jd)],
+        'greatCircleDistance': lambda: [greatCircleDistance(LAT, LON, a, b) for a, b in zip(lat2, lon2)],
+        'angleBetweenSphericalCoords': lambda: [angleBetweenSphericalCoords(LAT, LON, a, b) for a, b in zip(lat2, lon2)],
+    }
+
+
+def _arrayCases(d):
+    """ The array benchmarks, one call on the whole array """
+    return {
+        'date2JD': lambda: datetime64ToJD(d['dt64']),
+        'jd2Date': lambda: jdToDatetime64(d['jd']),
+        'jd2LST': lambda: jd2LST(d['jd'], -1.30616),
+        'raDec2AltAz': lambda: raDec2AltAz_vect(d['ra'], d['dec'], d['jd'], LAT, LON),
+        'altAz2RADec': lambda: altAz2RADec_vect(d['az'], d['alt'], d['jd'], LAT, LON),
+        'equatorialCoordPrecession': lambda: equatorialCoordPrecession_vect(J2000, d['jd'][0], d['ra'], d['dec']),
+        'greatCircleDistance': lambda: greatCircleDistance(LAT, LON, d['lat2'], d['lon2']),
+        'angleBetweenSphericalCoords': lambda: angleBetweenSphericalCoords(LAT, LON, d['lat2'], d['lon2']),
+    }
+
+
+def _timeIt(func, mintime=0.1, repeats=3):
+    """ Best time in seconds for one call of func, repeating the call enough times to get a stable figure """
+    # the first pass also warms up, and is kept if it was long enough
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= mintime:
+            break
+        loops = int(loops * min(mintime / max(elapsed, 1e-7) * 1.2, 100)) + 1
+    best = elapsed / loops
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best, loops
+
+
+def runBenchmarks(sizes=None, maxscalar=None, names=None, verbose=True):
+    """ Run the benchmarks and return the results as a dict  
+
+    Keyword arguments:  
+        sizes: [list] numbers of elements to test. Default 1, 1000 and 1000000.  
+        maxscalar: [int] skip scalar cases larger than this, as they can be slow. Default no limit.  
+        names: [list] only run these functions. Default all of them.  
+        verbose: [bool] print the results as they are measured. Default True.  
+
+    Returns:  
+        a dict of metadata and results, keyed by function/mode/size  
+    """
+    sizes = sizes or SIZES
+    results = {}
+    for n in sizes:
+        data = _makeData(n)
+        for mode, cases in [('scalar', _scalarCases(data)), ('array', _arrayCases(data))]:
+            if mode == 'scalar' and maxscalar is not None and n > maxscalar:
+                continue
+            for name, func in cases.items():
+                if names and name not in names:
+                    continue
+                secs, loops = _timeIt(func)
+                key = f'{name}/{mode}/{n}'
+                results[key] = {'function': name, 'mode': mode, 'size': n, 'seconds': secs,
+                                'per_element': secs / n, 'loops': loops}
+                if verbose:
+                    print(f'{key:50s} {secs:12.6f}s {secs/n*1e6:12.4f}us/element')
+    meta = {'date': datetime.datetime.now().isoformat(), 'python': platform.python_version(),
+            'numpy': np.__version__, 'platform': platform.platform(), 'seed': SEED}
+    return {'meta': meta, 'results': results}
+
+
+def compareBenchmarks(basefile, newfile, threshold=0.1):
+    """ Compare two sets of benchmark results and report any regressions  
+
+    Arguments:  
+        basefile: [str] JSON file of the baseline results  
+        newfile: [str] JSON file of the new results  
+
+    Keyword arguments:  
+        threshold: [float] fractional slowdown that counts as a regression. Default 0.1, ie 10%.  
+
+    Returns:  
+        a list of the keys that regressed  
+    """
+    base = json.load(open(basefile))['results']
+    new = json.load(open(newfile))['results']
+    regressions = []
+    for key in sorted(set(base) & set(new)):
+        ratio = new[key]['seconds'] / base[key]['seconds']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        print(f'{key:50s} {base[key]["seconds"]:12.6f}s {new[key]["seconds"]:12.6f}s {ratio:8.2f}x {flag}')
+    for key in sorted(set(base) ^ set(new)):
+        print(f'{key:50s} only in {"baseline" if key in base else "new results"}')
+    print(f'{len(regressions)} regressions beyond {threshold*100:.0f}%')
+    return regressions
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="""Benchmark the coordinate and time maths in utils.Math""",
+        formatter_class=argparse.RawTextHelpFormatter)
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-o', '--output', metavar='OUTFILE', help='JSON file to save results to')
+    run_parser.add_argument('-s', '--sizes', metavar='SIZES', help='comma-separated sizes, default 1,1000,1000000')
+    run_parser.add_argument('-m', '--maxscalar', metavar='MAXSCALAR', type=int, help='largest size for the scalar cases')
+    run_parser.add_argument('-f', '--functions', metavar='FUNCS', help='comma-separated functions to benchmark')
+
+    cmp_parser = subparsers.add_parser('compare', help='compare two results files')
+    cmp_parser.add_argument('basefile', help='baseline JSON results')
+    cmp_parser.add_argument('newfile', help='new JSON results')
+    cmp_parser.add_argument('-t', '--threshold', metavar='THRESHOLD', type=float, default=0.1,
+        help='fractional slowdown to flag as a regression, default 0.1')
+
+    cml_args = arg_parser.parse_args()
+    if cml_args.command == 'run':
+        sizes = [int(float(s)) for s in cml_args.sizes.split(',')] if cml_args.sizes else None
+        names = cml_args.functions.split(',') if cml_args.functions else None
+        res = runBenchmarks(sizes, cml_args.maxscalar, names)
+        if cml_args.output:
+            with open(cml_args.output, 'w') as outf:
+                json.dump(res, outf, indent=2)
+    else:
+        regressions = compareBenchmarks(cml_args.basefile, cml_args.newfile, cml_args.threshold)
+        sys.exit(1 if regressions else 0)
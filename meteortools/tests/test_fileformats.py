@@ -1,14 +1,19 @@
-from fileformats import filterFTPforSpecificTime
-from fileformats import IMOshowerList, majorlist, minorlist
+from fileformats import filterFTPforSpecificTime, filterFTPforSpecificTimes
+from fileformats import loadFTPDetectInfo, loadFTPDetectTable, iterFTPDetectInfo, FTPDetectIndex
+from fileformats import loadFTPDetectTree, CompactMeteorObservation, writeFTPDetectFile, StationLocations
+from fileformats import IMOshowerList, majorlist, minorlist, getIMOshowerList
 from fileformats import loadPlatepars
 from fileformats import UAXml, UCXml
 from fileformats import readCameraKML, trackCsvtoKML, trackKMLtoCsv #, getTrackDetails
 
 import shutil
 import filecmp
+import glob
 import os
 import datetime
 import json
+import numpy as np
+import xmltodict
 
 here = os.path.split(os.path.abspath(__file__))[0]
 
@@ -28,14 +33,314 @@ def test_filterFTPforSpecificTime():
     assert lis[0] == 'Meteor Count = 000001\n'
     os.remove(ftpfile)
     os.remove(oldftpfile)
-    
 
-def test_IMOShowerList():
+
+def test_filterFTPforSpecificTimes():
+    ftpfile = os.path.join(here, 'data', 'mdr', 'UK0006', 'ConfirmedFiles', 'UK0006_20230421_194826_180103', 
+        'FTPdetectinfo_UK0006_20230421_194826_180103.txt')
+    outdir = os.path.join(here, 'data')
+    dtstrs = ['20230421_212230', '20230421_234700', '20230421_120000']
+    res = filterFTPforSpecificTimes(ftpfile, dtstrs, outdir=outdir)
+    assert [r[1] for r in res] == [1, 1, 0]
+    assert os.path.isfile(ftpfile)
+    assert not os.path.isfile(ftpfile + '.old')
+    lis = open(res[0][0], 'r').readlines()
+    assert lis[12] == 'FF_UK0006_20230421_212224_982_0115712.fits\n'
+    for r in res:
+        os.remove(r[0])
+    newname, nummets = filterFTPforSpecificTimes(ftpfile, dtstrs, combined=True, outdir=outdir)
+    assert nummets == 2
+    os.remove(newname)
+
+
+def test_filterFTPforSpecificTimesBoundaries():
+    # the batch filter must select the same meteors as the single-time filter, including at the edges of the window
+    srcftpfile = os.path.join(here, 'data', 'mdr', 'UK0006', 'ConfirmedFiles', 'UK0006_20230421_194826_180103', 
+        'FTPdetectinfo_UK0006_20230421_194826_180103.txt')
+    ftpfile = os.path.join(here, 'data', 'FTPdetectinfo_UK0006_boundaries.txt')
+    outdir = os.path.join(here, 'data')
+    dtstrs = ['20230421_212223', '20230421_212224', '20230421_212244', '20230421_212245', '20230422_002900']
+    res = filterFTPforSpecificTimes(srcftpfile, dtstrs, outdir=outdir)
+    for dtstr, (newname, nummets) in zip(dtstrs, res):
+        shutil.copy(srcftpfile, ftpfile)
+        _, single = filterFTPforSpecificTime(ftpfile, dtstr)
+        os.remove(ftpfile)
+        os.remove(ftpfile + '.old')
+        os.remove(newname)
+        assert nummets == single
+    assert [r[1] for r in res] == [0, 1, 1, 0, 1]
+
+
+def test_loadFTPDetectTable():
+    ftpfile = os.path.join(here, 'data', 'mdr', 'UK0006', 'ConfirmedFiles', 'UK0006_20230421_194826_180103', 
+        'FTPdetectinfo_UK0006_20230421_194826_180103.txt')
+    tbl = loadFTPDetectTable(ftpfile)
+    assert len(tbl) == 23
+    assert tbl.offsets[-1] == len(tbl.frame)
+    met = tbl[0]
+    assert met.ff_name == 'FF_UK0006_20230421_212224_982_0115712.fits'
+    assert np.shares_memory(met.ra_data, tbl.ra)
+
+
+def test_loadFTPDetectInfoColumnar():
+    ftpfile = os.path.join(here, 'data', 'mdr', 'UK0006', 'ConfirmedFiles', 'UK0006_20230421_194826_180103', 
+        'FTPdetectinfo_UK0006_20230421_194826_180103.txt')
+    mets = loadFTPDetectInfo(ftpfile)
+    colmets = loadFTPDetectInfo(ftpfile, columnar=True)
+    assert len(mets) == len(colmets)
+    for m1, m2 in zip(mets, colmets):
+        assert m1.ff_name == m2.ff_name
+        assert np.allclose(m1.ra_data, m2.ra_data)
+        assert np.allclose(m1.time_data, m2.time_data)
+
+
+def test_iterFTPDetectInfo(tmp_path):
+    ftpfile = os.path.join(here, 'data', 'mdr', 'UK000F', 'ConfirmedFiles', 'UK000F_20230423_195211_138993', 
+        'FTPdetectinfo_UK000F_20230423_195211_138993.txt')
+    mets = loadFTPDetectInfo(ftpfile)
+    itmets = list(iterFTPDetectInfo(ftpfile))
+    assert len(itmets) == len(mets)
+    assert [m.ff_name for m in itmets] == [m.ff_name for m in mets]
+    first = next(iterFTPDetectInfo(ftpfile, join_broken_meteors=False))
+    assert first.ff_name == mets[0].ff_name.split(',')[0]
+    # the iterator joins segments that are out of order in the file, as loadFTPDetectInfo does
+    ftpfile = os.path.join(tmp_path, 'FTPdetectinfo_UK9999_20230101_180000_000000.txt')
+    locdata = _writeOutOfOrderFTPFile(ftpfile)
+    mets = loadFTPDetectInfo(ftpfile, locdata=locdata)
+    itmets = list(iterFTPDetectInfo(ftpfile, locdata=locdata))
+    assert [len(m.frames) for m in itmets] == [len(m.frames) for m in mets] == [16 + 256]
+
+
+def test_FTPDetectIndex():
+    ftpfile = os.path.join(here, 'data', 'mdr', 'UK0006', 'ConfirmedFiles', 'UK0006_20230421_194826_180103', 
+        'FTPdetectinfo_UK0006_20230421_194826_180103.txt')
+    idx = FTPDetectIndex(ftpfile)
+    assert len(idx) == 23
+    assert os.path.isfile(ftpfile + '.idx')
+    met = idx.get('FF_UK0006_20230421_234652_920_0331520.fits')
+    assert met.ff_name == 'FF_UK0006_20230421_234652_920_0331520.fits'
+    assert idx.get('FF_UK0006_20230421_000000_000_0000000.fits') is None
+    idx2 = FTPDetectIndex(ftpfile)
+    assert idx2.getByIndex(0).ff_name == 'FF_UK0006_20230421_212224_982_0115712.fits'
+    os.remove(ftpfile + '.idx')
+
+
+def test_loadFTPDetectInfoCache():
+    ftpfile = os.path.join(here, 'data', 'mdr', 'UK0006', 'ConfirmedFiles', 'UK0006_20230423_195209_508127', 
+        'FTPdetectinfo_UK0006_20230423_195209_508127.txt')
+    cachefile = ftpfile + '.parquet.snap'
+    mets = loadFTPDetectInfo(ftpfile, cache=True)
+    assert os.path.isfile(cachefile)
+    cachedmets = loadFTPDetectInfo(ftpfile, cache=True)
+    assert len(mets) == len(cachedmets) == 3
+    assert cachedmets[0].ff_name == mets[0].ff_name
+    assert np.allclose(cachedmets[0].ra_data, mets[0].ra_data)
+    os.remove(cachefile)
+
+
+def test_loadFTPDetectTree():
+    datadir = os.path.join(here, 'data', 'mdr')
+    df = loadFTPDetectTree(datadir, ['UK0006', 'UK000F'], '20230421', '20230423', workers=2)
+    assert df.meteor_id.nunique() == 23 + 3 + 29 + 9
+    assert sorted(df.night.unique()) == ['20230421', '20230423']
+    tables = loadFTPDetectTree(datadir, ['UK0006', 'UK000F'], '20230421', '20230423', workers=1, asDict=True)
+    assert len(tables[('UK0006', '20230421')]) == 23
+
+
+def test_loadFTPDetectTreeMergesFolders(tmp_path):
+    # two capture folders on the same night, the first ending and the second starting with meteor 0
+    camdir = os.path.join(tmp_path, 'UK9999', 'ConfirmedFiles')
+    for dirname, nmets in [('UK9999_20230101_170000_000000', 1), ('UK9999_20230101_230000_000000', 3)]:
+        os.makedirs(os.path.join(camdir, dirname))
+        with open(os.path.join(camdir, dirname, '.config'), 'w') as outf:
+            outf.write('[System]\nlatitude: 51.0\nlongitude: -1.0\nelevation: 80\n')
+        lines = [f'Meteor Count = {nmets:06d}'] + ['-----'] * 10
+        for met in range(nmets):
+            lines += ['-------------------------------------------------------', 
+                f'FF_UK9999_{dirname[7:22]}_000_{1024 * (met + 1):07d}.fits', 'RMS data reprocessed on: 2023-01-01', 
+                f'UK9999 {met + 1:04d} 0005 25.00 000.0 000.0  00.0 000.0 0000.0 0000.0']
+            for fr in range(5):
+                lines.append(f'{fr:.4f} 0100.00 0100.00 100.0000 +20.0000 100.0000 +40.0000 000000 2.00')
+        with open(os.path.join(camdir, dirname, f'FTPdetectinfo_{dirname}.txt'), 'w') as outf:
+            outf.write('\n'.join(lines) + '\n')
+    tables = loadFTPDetectTree(str(tmp_path), ['UK9999'], '20230101', '20230101', workers=1, asDict=True)
+    assert len(tables[('UK9999', '20230101')]) == 4
+    df = loadFTPDetectTree(str(tmp_path), ['UK9999'], '20230101', '20230101', workers=1)
+    assert df.meteor_id.nunique() == 4
+
+
+def test_loadFTPDetectInfoJoinsChains():
+    # a fireball spanning three FF files
+    ftpfile = os.path.join(here, 'data', 'FTPdetectinfo_UK9999_20230101_170000_000000.txt')
+    hdr = ['Meteor Count = 000003'] + ['-----'] * 10
+    lines = hdr
+    for seg, (ffno, fr0, fr1) in enumerate([(1024, 240, 256), (1280, 0, 256), (1536, 0, 10)]):
+        lines += ['-------------------------------------------------------', 
+            f'FF_UK9999_20230101_200000_000_{ffno:07d}.fits', 'RMS data reprocessed on: 2023-01-01', 
+            'UK9999 0001 0010 25.00 000.0 000.0  00.0 000.0 0000.0 0000.0']
+        for fr in range(fr0, fr1):
+            ang = 0.01 * (256 * seg + fr)
+            lines.append(f'{fr:.4f} 0100.00 0100.00 {100 + ang:8.4f} {20 + ang:+7.4f} 100.0000 +40.0000 000000 2.00')
+    with open(ftpfile, 'w') as outf:
+        outf.write('\n'.join(lines) + '\n')
+    locdata = {'station_code': 'UK9999', 'lat': 51.0, 'lon': -1.0, 'elev': 80}
+    for mets in [loadFTPDetectInfo(ftpfile, locdata=locdata), 
+            loadFTPDetectInfo(ftpfile, locdata=locdata, columnar=True), 
+            list(iterFTPDetectInfo(ftpfile, locdata=locdata))]:
+        assert len(mets) == 1
+        assert len(mets[0].ff_name.split(',')) == 3
+        assert len(mets[0].frames) == 16 + 256 + 10
+        assert mets[0].frames[-1] == 512 + 9
+    os.remove(ftpfile)
+
+
+def _writeOutOfOrderFTPFile(ftpfile):
+    # a meteor broken across two FF files, listed with the later file first
+    lines = ['Meteor Count = 000002'] + ['-----'] * 10
+    for seg, (ffno, fr0, fr1) in reversed(list(enumerate([(1024, 240, 256), (1280, 0, 256)]))):
+        lines += ['-------------------------------------------------------', 
+            f'FF_UK9999_20230101_200000_000_{ffno:07d}.fits', 'RMS data reprocessed on: 2023-01-01', 
+            'UK9999 0001 0010 25.00 000.0 000.0  00.0 000.0 0000.0 0000.0']
+        for fr in range(fr0, fr1):
+            ang = 0.01 * (256 * seg + fr)
+            lines.append(f'{fr:.4f} 0100.00 0100.00 {100 + ang:8.4f} {20 + ang:+7.4f} 100.0000 +40.0000 000000 2.00')
+    with open(ftpfile, 'w') as outf:
+        outf.write('\n'.join(lines) + '\n')
+    return {'station_code': 'UK9999', 'lat': 51.0, 'lon': -1.0, 'elev': 80}
+
+
+def test_loadFTPDetectInfoJoinsOutOfOrder(tmp_path):
+    ftpfile = os.path.join(tmp_path, 'FTPdetectinfo_UK9999_20230101_180000_000000.txt')
+    locdata = _writeOutOfOrderFTPFile(ftpfile)
+    for mets in [loadFTPDetectInfo(ftpfile, locdata=locdata), loadFTPDetectInfo(ftpfile, locdata=locdata, columnar=True)]:
+        assert len(mets) == 1
+        assert len(mets[0].frames) == 16 + 256
+
+
+def test_loadFTPDetectInfoCompact():
+    ftpfile = os.path.join(here, 'data', 'mdr', 'UK000F', 'ConfirmedFiles', 'UK000F_20230423_195211_138993', 
+        'FTPdetectinfo_UK000F_20230423_195211_138993.txt')
+    mets = loadFTPDetectInfo(ftpfile)
+    assert not isinstance(mets[0], CompactMeteorObservation)
+    assert not isinstance(loadFTPDetectInfo(ftpfile, columnar=True)[0], CompactMeteorObservation)
+    for cmets in [loadFTPDetectInfo(ftpfile, compact=True), loadFTPDetectInfo(ftpfile, compact=True, columnar=True)]:
+        assert len(cmets) == len(mets)
+        assert isinstance(cmets[0], CompactMeteorObservation)
+        assert not hasattr(cmets[0], '__dict__')
+        assert cmets[0].x_data.dtype == np.float32
+        assert cmets[0].ra_data.dtype == np.float64
+        assert np.allclose(cmets[0].x_data, mets[0].x_data, atol=0.01)
+        assert sum(m.nbytes for m in cmets) < sum(m.nbytes for m in mets)
+
+
+def test_writeFTPDetectFile():
+    ftpfile = os.path.join(here, 'data', 'mdr', 'UK0006', 'ConfirmedFiles', 'UK0006_20230421_194826_180103', 
+        'FTPdetectinfo_UK0006_20230421_194826_180103.txt')
+    outfile = os.path.join(here, 'data', 'FTPdetectinfo_UK0006_20230421_194826_180103.txt')
+    mets = loadFTPDetectInfo(ftpfile, join_broken_meteors=False)
+    writeFTPDetectFile(outfile, mets)
+    newlis = open(outfile, 'r').readlines()
+    assert newlis[0] == 'Meteor Count = 000023\n'
+    assert newlis[12] == 'FF_UK0006_20230421_212224_982_0115712.fits\n'
+    assert newlis[15] == '181.5648 0416.03 0406.68 139.4958 +8.4746 219.3214 +40.3624 000000 2.34\n'
+    newmets = loadFTPDetectInfo(outfile, join_broken_meteors=False, locdata={'station_code': 'UK0006', 
+        'lat': 51.88, 'lon': -1.31, 'elev': 80})
+    assert len(newmets) == len(mets)
+    assert np.allclose(newmets[-1].ra_data, mets[-1].ra_data, atol=1e-5)
+    os.remove(outfile)
+
+
+def test_StationLocations():
+    ftpfile = os.path.join(here, 'data', 'mdr', 'UK0006', 'ConfirmedFiles', 'UK0006_20230421_194826_180103', 
+        'FTPdetectinfo_UK0006_20230421_194826_180103.txt')
+    locs = StationLocations()
+    loc = locs.get(ftpfile)
+    assert loc['station_code'] == 'UK0006'
+    assert abs(loc['lat'] - 51.88) < 0.01
+    assert locs.get(ftpfile) is loc
+    assert locs.hits == 1 and locs.misses == 1
+    assert len(loadFTPDetectInfo(ftpfile, locdata=loc)) == 23
+
+
+def test_IMOShowerList(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     iwsl = IMOshowerList()
     shwr = iwsl.getShowerByCode('PER')
     assert shwr['IAU_code'] == 'PER'
 
 
+def _makeTestStreamData(npyfile, xmlfile):
+    # a cut-down IAU stream table, so the tests don't need the full file
+    showers = xmltodict.parse(open(xmlfile, 'rb').read())['meteor_shower_list']['shower']
+    codes = [shwr['IAU_code'] for shwr in showers if shwr['IAU_code'] != 'PER']
+    streams = [('PER', '1', '140.0'), ('PER', '-1', '139.0'), ('XYZ', '-1', '200.0')] + [(c, '0', '100.0') for c in codes]
+    rows = []
+    for i, (code, flag, sollon) in enumerate(streams):
+        row = [''] * 20
+        row[1], row[3], row[4], row[6], row[7] = str(i + 1), code, f'name {code}', flag, sollon
+        row[8], row[9], row[12] = '48.0', '58.0', '59.0'
+        rows.append(row)
+    np.save(npyfile, np.array(rows))
+
+
+def test_IMOShowerListIndexed(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
+    xmlfile = os.path.join(here, '..', 'share', 'IMO_Working_Meteor_Shower_List.xml')
+    npyfile = os.path.join(tmp_path, 'teststreamdata.npy')
+    _makeTestStreamData(npyfile, xmlfile)
+    iwsl = IMOshowerList(xmlfile, npyfile)
+    assert list(iwsl.streamindex['PER']) == [0, 1]
+    shwr = iwsl.getShowerByCode('PER')
+    assert shwr['IAU_code'] == 'PER' and shwr['@id'] == '1'
+    assert iwsl.getShowerByCode('PER') == shwr
+    # callers get copies, so changing one can't affect the shared list
+    shwr['name'] = 'changed'
+    assert iwsl.getShowerByCode('PER')['name'] != 'changed'
+    assert iwsl.showerindex['PER']['name'] != 'changed'
+    full = iwsl.getShowerByCode('XYZ', useFull=True)
+    assert full['name'] == 'name XYZ' and full['pksollon'] == 200.0
+    assert iwsl.getStart('PER', '20230801') == datetime.datetime.strptime('2023 ' + shwr['start'], '%Y %b %d')
+    assert iwsl.getPeak('PER', '20230801').year == 2023
+    assert iwsl.getEnd('QUA', '20231215').year == 2024
+    assert 'PER' in iwsl.getActiveShowers(datetime.datetime(2023, 8, 12), True)
+
+
+def test_getActiveShowersForDates(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
+    xmlfile = os.path.join(here, '..', 'share', 'IMO_Working_Meteor_Shower_List.xml')
+    npyfile = os.path.join(tmp_path, 'teststreamdata3.npy')
+    _makeTestStreamData(npyfile, xmlfile)
+    iwsl = IMOshowerList(xmlfile, npyfile)
+    dates = [datetime.datetime(2023, 1, 1) + datetime.timedelta(days=d) for d in range(0, 400, 3)]
+    active = iwsl.getActiveShowersForDates(dates, majorOnly=True, inclMinor=True)
+    assert active == [iwsl.getActiveShowers(dt, True, True) for dt in dates]
+    # the December Leonis Minorids run from December to February
+    active = iwsl.getActiveShowersForDates(np.array(['2023-01-10', '2023-06-01', '2023-12-20'], dtype='datetime64[D]'))
+    assert ['DLM' in shwrs for shwrs in active] == [True, False, True]
+
+
+def test_getIMOshowerList(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
+    srcxml = os.path.join(here, '..', 'share', 'IMO_Working_Meteor_Shower_List.xml')
+    xmlfile = os.path.join(here, 'data', 'testshowerlist.xml')
+    npyfile = os.path.join(here, 'data', 'teststreamdata2.npy')
+    shutil.copy(srcxml, xmlfile)
+    np.save(npyfile, np.array([[''] * 20]))
+    sl = getIMOshowerList(xmlfile, npyfile)
+    assert getIMOshowerList(xmlfile, npyfile) is sl
+    # the snapshot goes in the cache folder, not next to the XML
+    assert len(glob.glob(os.path.join(tmp_path, 'showerlist-*.snap'))) == 1
+    assert not os.path.isfile(xmlfile + '.snap')
+    # a new instance loads the snapshot, and gets the same list
+    assert IMOshowerList(xmlfile, npyfile).showerlist == sl.showerlist
+    # changing the XML invalidates the snapshot
+    xml = open(xmlfile).read().replace('<IAU_code>PER</IAU_code>', '<IAU_code>PEZ</IAU_code>')
+    open(xmlfile, 'w').write(xml)
+    assert 'PEZ' in [shwr['IAU_code'] for shwr in IMOshowerList(xmlfile, npyfile).showerlist]
+    for fname in [xmlfile, npyfile]:
+        os.remove(fname)
+
+
 def test_MajMin():
     assert majorlist[0] == 'QUA'
     assert minorlist[0] == 'SPE'
@@ -2,17 +2,23 @@
 import datetime
 import numpy as np
 import os
+import pandas as pd
 import shutil
+import subprocess
+import sys
 
-from utils import getOverlapWith, pointInsideFov, checkKMLOverlap, getOverlappingCameras
+from utils.VectorMaths import shortestDistance, shortestDistanceBatch
+from utils import getOverlapWith, pointInsideFov, checkKMLOverlap, getOverlappingCameras, getOverlapGraph, FovStore
 from utils import trackToDistvsHeight, trackToTimevsVelocity, trackToTimevsHeight
 
 from utils import jd2Date, date2JD, datetime2JD, jd2DynamicalTimeJD, jd2LST, sollon2jd, \
     greatCircleDistance, angleBetweenSphericalCoords, calcApparentSiderealEarthRotation, \
-    raDec2AltAz, altAz2RADec, \
+    raDec2AltAz, altAz2RADec, raDec2AltAz_vect, altAz2RADec_vect, \
     getActiveShowers, getShowerDets, getShowerPeak, getActiveShowersStr, \
     drawFTPFile, equatorialCoordPrecession, \
-    annotateImage, annotateImageArbitrary, sendAnEmail
+    annotateImage, annotateImageArbitrary, sendAnEmail, datetime64ToJD, jdToDatetime64, \
+    SiderealTimeCache, equatorialCoordPrecessionBatch, GeoIndex, jd2sollon, \
+    associateShowers
 
 
 here = os.path.split(os.path.abspath(__file__))[0]
@@ -48,11 +54,39 @@ def test_datetime2JD():
     assert abs(jdt - 2460063.0077546295) < 0.00001
 
 
+def test_datetime64ToJD():
+    rng = np.random.default_rng(1)
+    dts = np.datetime64('2020-01-01T00:00:00') + rng.integers(0, 10*365*86400*1000000, 1000).astype('timedelta64[us]')
+    jds = datetime64ToJD(dts)
+    assert all(jd == datetime2JD(dt) for jd, dt in zip(jds, dts.astype(object)))
+    jds = datetime64ToJD(np.array(['2023-04-29T21:16:02', 'NaT'], dtype='datetime64[s]'))
+    assert jds[0] == date2JD(2023,4,29,21,16,2)
+    assert np.isnan(jds[1])
+
+
+def test_jdToDatetime64():
+    rng = np.random.default_rng(1)
+    jds = 2458849.5 + rng.uniform(0, 3650, 1000)
+    dts = jdToDatetime64(jds)
+    assert all(dt == jd2Date(jd, dt_obj=True) for jd, dt in zip(jds, dts.astype(object)))
+    # out of range dates go to the start of year 1, as in jd2Date
+    dts = jdToDatetime64([-10, 1e10, np.nan])
+    assert dts[0] == np.datetime64('0001-01-01') and dts[1] == np.datetime64('0001-01-01')
+    assert np.isnat(dts[2])
+
+
 def test_jd2DynamicalTimeJD():
     dynjdt = jd2DynamicalTimeJD(2460063.0077546295)
     assert abs(dynjdt - 2460063.0085553704) < 0.00001
 
 
+def test_jd2DynamicalTimeJDLeapSeconds():
+    jds = np.array([date2JD(2016,12,31,23,59,59), date2JD(2017,1,1,0,0,0), date2JD(1980,6,1,0,0,0)])
+    tt = jd2DynamicalTimeJD(jds)
+    assert np.allclose((tt - jds)*86400, [36 + 32.184, 37 + 32.184, 19 + 32.184], atol=1e-4)
+    assert all(jd2DynamicalTimeJD(jd) == t for jd, t in zip(jds, tt))
+
+
 def test_jd2LST(): 
     lst = jd2LST(2460063.0077546295, np.radians(-2.54))
     assert lst == (38.95722137057129, 39.001552733571955)
@@ -68,6 +102,21 @@ def test_sollon2jdBad():
     assert abs(jd - 1757669.2195869812) < 0.0000001
 
 
+def test_sollon2jdArray():
+    jds = sollon2jd(np.array([2020, 2021, 100]), 4, np.array([32.0, 32.0, 32.0]))
+    assert abs(jds[0] - 2458961.4503479283) < 0.0000001
+    assert abs(jds[1] - sollon2jd(2021, 4, 32.0)) < 0.0000001
+    assert abs(jds[2] - 1757669.2195869812) < 0.0000001
+
+
+def test_jd2sollon():
+    assert abs(jd2sollon(2458961.4503479283) - 32.0) < 0.001
+    lons = np.array([10.5, 141.3, 232.2, 283.1])
+    jds = sollon2jd(2023, np.array([3, 8, 12, 12]), lons)  # months the sollons fall in
+    assert np.abs(jd2sollon(jds) - lons).max() < 0.001
+    assert np.isnan(jd2sollon(np.array([np.nan]))[0])
+
+
 def test_greatCircleDistance():
     lat1 = np.radians(55.9533)
     lon1 = np.radians(-3.188)
@@ -77,6 +126,38 @@ def test_greatCircleDistance():
     assert abs(gsd - 873.434938894131) < 0.00001
 
 
+def test_GeoIndex():
+    rng = np.random.default_rng(7)
+    lats = rng.uniform(49, 59, 2000)
+    lons = rng.uniform(-8, 2, 2000)
+    idx = GeoIndex(lats, lons)
+    dists = greatCircleDistance(np.radians(51.88), np.radians(-1.31), np.radians(lats), np.radians(lons))
+    assert np.array_equal(idx.withinRadius(51.88, -1.31, 50), np.where(dists <= 50)[0])
+    nd, ni = idx.nearest(51.88, -1.31, k=3)
+    assert np.array_equal(ni, np.argsort(dists)[:3])
+    assert np.allclose(nd, np.sort(dists)[:3])
+    res = idx.withinRadiusBatch([51.88, 55.0], [-1.31, -3.0], 50)
+    assert len(res) == 2 and np.array_equal(res[0], np.where(dists <= 50)[0])
+    assert np.allclose(idx.distances(51.88, -1.31), dists)
+
+
+def test_shortestDistanceBatch():
+    rng = np.random.default_rng(5)
+    A, B = rng.normal(size=(20, 3)), rng.normal(size=(20, 3))
+    C, D = rng.normal(size=(30, 3)), rng.normal(size=(30, 3))
+    s, t, dist = shortestDistanceBatch(A, B, C, D, allpairs=True)
+    assert dist.shape == (20, 30)
+    s1, t1, d1 = shortestDistance(A[3], B[3], C[4], D[4])
+    assert abs(s[3, 4] - s1) < 1e-9 and abs(t[3, 4] - t1) < 1e-9 and abs(dist[3, 4] - d1) < 1e-9
+    s, t, dist = shortestDistanceBatch(A, B, C[:20], D[:20])
+    assert dist.shape == (20,) and abs(dist[4] - shortestDistance(A[4], B[4], C[4], D[4])[2]) < 1e-9
+    i, j, s, t, close = shortestDistanceBatch(A, B, C, D, allpairs=True, threshold=0.2)
+    assert np.all(close <= 0.2) and len(i) == len(j) == len(close)
+    # parallel lines 5 units apart
+    s, t, dist = shortestDistanceBatch([[0, 0, 0]], [[1, 0, 0]], [[5, 3, 4]], [[2, 0, 0]])
+    assert abs(dist[0] - 5) < 1e-12
+
+
 def test_angleBetweenSphericalCoords():
     p1 = np.radians(55.9533)
     l1 = np.radians(-3.188)
@@ -92,6 +173,21 @@ def test_calcApparentSiderealEarthRotation():
     assert abs(asr - 3.361258) < 0.0001
 
 
+def test_SiderealTimeCache():
+    cache = SiderealTimeCache(bucket_seconds=60, maxsize=5)
+    jds = 2460063.0077546295 + np.arange(250)/25/86400  # ten seconds of frames
+    exact = calcApparentSiderealEarthRotation(jds)
+    cached = [cache.calcApparentSiderealEarthRotation(jd) for jd in jds]
+    assert np.degrees(np.abs(exact - cached)).max() * 3600 < 1e-4
+    assert cache.misses == 1 and cache.hits == 249
+    lst, gst = cache.jd2LST(jds, -1.31)
+    assert abs(lst[0] - jd2LST(jds[0], -1.31)[0]) < 1e-8
+    cache.calcApparentSiderealEarthRotation(2460063.5 + np.arange(10)/24)
+    assert len(cache) == 5
+    cache.clear()
+    assert len(cache) == 0 and cache.hits == 0
+
+
 def test_raDec2AltAz():
     # location of arcturus at 2023-04-29 21:16:02 UT from Oxford
     jd = date2JD(2023,4,29,21,16,2)
@@ -116,46 +212,97 @@ def test_altAz2RADec():
     assert abs(19.058 - dec) < 0.02
 
 
-def test_getActiveShowers():
+def test_raDec2AltAzVect():
+    rng = np.random.default_rng(42)
+    ra = rng.uniform(0, 2*np.pi, 50)
+    dec = rng.uniform(-1.4, 1.4, 50)
+    jd = date2JD(2023,4,29,21,16,2) + rng.uniform(0, 30, 50)
+    lat, lon = np.radians(51.88310), np.radians(-1.30616)
+    az, alt = raDec2AltAz_vect(ra, dec, jd, lat, lon)
+    azs, alts = zip(*[raDec2AltAz(r, d, j, lat, lon) for r, d, j in zip(ra, dec, jd)])
+    assert np.allclose(az, azs, rtol=0, atol=1e-12)
+    assert np.allclose(alt, alts, rtol=0, atol=1e-12)
+    ra2, dec2 = altAz2RADec_vect(az, alt, jd, lat, lon)
+    ras, decs = zip(*[altAz2RADec(a, e, j, lat, lon) for a, e, j in zip(az, alt, jd)])
+    assert np.allclose(ra2, ras, rtol=0, atol=1e-12)
+    assert np.allclose(dec2, decs, rtol=0, atol=1e-12)
+    # a single time broadcast against many positions and observers
+    az, alt = raDec2AltAz_vect(ra, dec, jd[0], np.full(50, lat), lon)
+    assert az.shape == (50,)
+    assert abs(az[3] - raDec2AltAz(ra[3], dec[3], jd[0], lat, lon)[0]) < 1e-12
+
+
+def test_getActiveShowers(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     sl = getActiveShowers('20230423',True)
     assert sl == ['LYR', 'ETA']
 
 
-def test_getActiveShowersNoRet():
+def test_getActiveShowersNoRet(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     sl = getActiveShowers('20230423',False)
     assert sl is None
 
 
-def test_getQuietActiveShowers():
+def test_getQuietActiveShowers(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     sl = getActiveShowers('20230223',True)
     assert sl == []
 
 
-def test_getQuietActiveShowersStr():
+def test_getQuietActiveShowersStr(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     sl = getActiveShowersStr('20230223')
     assert sl is None
 
 
-def test_getShowerDets():
+def test_getShowerDets(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     sl = getShowerDets('LYR')
     assert sl == (6, 'Lyrids', 31.7, '04-22')
 
 
-def test_getShowerDetsStr():
+def test_getShowerDetsStr(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     sl = getShowerDets('LYR', stringFmt=True)
     assert sl == '31.7,04-22,Lyrids,LYR'
 
 
-def test_getNonExistentShowerDets():
+def test_getNonExistentShowerDets(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     sl = getShowerDets('XXX')
     assert sl == (0, 'Unknown', 0, 'Unknown')
 
 
-def test_getShowerPeak():
+def test_getShowerPeak(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     sl = getShowerPeak('LYR')
     assert sl == '04-22'
 
 
+def test_associateShowers():
+    table = np.load(os.path.join(here, '..', 'share', 'gmn_shower_table_20230518.npy'))
+    per = table[(table[:,5] == 7) & (np.abs(np.degrees(table[:,0]) - 140) < 0.01)][0]
+    wrap = table[table[:,0] == 0][0]
+    streamfile = os.path.join(here, 'data', 'teststreams.npy')
+    rows = [[''] * 20 for _ in range(2)]
+    rows[0][1], rows[0][3], rows[1][1], rows[1][3] = '7', 'PER', str(int(wrap[5])), 'WRP'
+    np.save(streamfile, np.array(rows))
+    # a Perseid, a meteor just before 360 that matches a shower tabulated at 0, a sporadic and a bad row
+    sol = np.array([140.0, 359.95, 140.0, np.nan])
+    lng = np.degrees([per[1], wrap[1], per[1], 0]) + sol
+    df = pd.DataFrame({'_sol': sol, '_elng': lng, '_elat': np.degrees([per[2], wrap[2], per[2], 0]),
+                       '_vg': np.array([per[3], wrap[3], 5000, 0]) / 1000}, index=[10, 11, 12, 13])
+    res = associateShowers(df, streamfile=streamfile)
+    assert list(res.index) == [10, 11, 12, 13]
+    assert list(res.shower) == ['PER', 'WRP', 'spo', 'spo']
+    assert res.iau_no.iloc[0] == 7 and res.iau_no.iloc[2] == -1
+    assert res.rad_dist.iloc[0] < 1e-3 and np.isnan(res.rad_dist.iloc[2])
+    assert abs(res.vg_diff.iloc[0]) < 1e-6
+    assert res.equals(associateShowers(df, chunksize=1, streamfile=streamfile))
+    os.remove(streamfile)
+
+
 def test_calcNutationComponents():
     # not tested
     assert 1 == 1
@@ -171,6 +318,39 @@ def test_equatorialCoordPrecession():
     assert abs(np.degrees(dec1) - 20.006857) < 0.00001
 
 
+def test_equatorialCoordPrecessionBatch():
+    d1 = date2JD(2023,4,1,0,0,0)
+    d2 = date2JD(2025,4,1,0,0,0)
+    rng = np.random.default_rng(3)
+    ra = rng.uniform(0, 2*np.pi, 100)
+    dec = np.arcsin(rng.uniform(-1, 1, 100))
+    dec[:4] = np.radians([89.8, -89.9, 89.99, -89.6])  # near the poles
+    ra1, dec1 = equatorialCoordPrecessionBatch(d1, d2, ra, dec)
+    ras, decs = zip(*[equatorialCoordPrecession(d1, d2, r, d) for r, d in zip(ra, dec)])
+    assert np.abs((ra1 - ras + np.pi) % (2*np.pi) - np.pi).max() < 1e-9
+    assert np.abs(dec1 - decs).max() < 1e-9
+    # a different final epoch for each coordinate
+    d2s = d2 + np.arange(100) * 1.7
+    ra1, dec1 = equatorialCoordPrecessionBatch(d1, d2s, ra, dec)
+    ras, decs = zip(*[equatorialCoordPrecession(d1, e, r, d) for e, r, d in zip(d2s, ra, dec)])
+    assert np.abs((ra1 - ras + np.pi) % (2*np.pi) - np.pi).max() < 1e-9
+    assert np.abs(dec1 - decs).max() < 1e-9
+
+
+def test_lazyImports():
+    # importing the packages, or a light function, must not load the heavy libraries used elsewhere
+    heavy = ['googleapiclient', 'matplotlib', 'shapely', 'ephem']
+    code = ('import sys, time; start = time.perf_counter(); '
+            'import meteortools, meteortools.utils, meteortools.fileformats, meteortools.ukmondb, meteortools.rmsutils; '
+            'from meteortools.utils import annotateImage, jd2Date; '
+            f'print(time.perf_counter() - start, *[m for m in {heavy} if m in sys.modules])')
+    env = dict(os.environ, PYTHONPATH=os.path.join(here, '..', '..'))
+    res = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    elapsed, *loaded = res.stdout.split()
+    print(f'import time {float(elapsed):.3f}s')
+    assert loaded == []
+
+
 def test_drawFTPFile():
     ftpfile = os.path.join(here, 'data', 'FTPdetectinfo_UK006S_20230112_170327_316507.txt.orig')
     cfgfile = os.path.join(here, 'data', '.config')
@@ -188,7 +368,8 @@ def test_drawFTPFileNocfg():
     os.remove(outf)
 
 
-def test_getOverlapWith():
+def test_getOverlapWith(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     srcfolder = os.path.join(here, 'data', 'kmls')
     kmlpat='*-70km.kml'
     refcam = 'UK008A'
@@ -210,12 +391,38 @@ def test_checkKMLOverlap():
     assert res is True
 
 
-def test_getOverlappingCameras():
+def test_getOverlappingCameras(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
     srcfldr = os.path.join(here, 'data', 'kmls')
     res = getOverlappingCameras(srcfldr, '*-70km.kml')
     assert res is not None
 
 
+def test_FovStore(tmp_path):
+    srcfldr = os.path.join(here, 'data', 'kmls')
+    cachefile = os.path.join(tmp_path, 'testfovstore.snap')
+    store = FovStore(srcfldr, '*-70km.kml', cachefile=cachefile)
+    assert os.path.isfile(cachefile)
+    assert ('UK000S' in store.overlapsWith('UK0006')) == checkKMLOverlap(kml1, kml2)
+    # the second store reads the polygons from the cache
+    store2 = FovStore(srcfldr, '*-70km.kml', cachefile=cachefile)
+    assert all(p1.equals(p2) for p1, p2 in zip(store.polygons, store2.polygons))
+    graph = store.adjacency()
+    assert all(cam in graph[other] for cam in graph for other in graph[cam])
+    groups = store.connectedComponents()
+    assert sorted(sum(groups, [])) == sorted(store.cameras)
+    nocache = FovStore(srcfldr, '*-70km.kml', cachefile=False)
+    assert nocache.adjacency() == graph
+
+
+def test_getOverlapGraph(tmp_path, monkeypatch):
+    monkeypatch.setenv('METEORTOOLS_CACHE', str(tmp_path))
+    srcfldr = os.path.join(here, 'data', 'kmls')
+    graph, groups = getOverlapGraph(srcfldr, '*-70km.kml')
+    assert 'UK000B' in graph['UK008A']
+    assert any('UK008A' in grp and 'UK000B' in grp for grp in groups)
+
+
 def test_trackToDistvsHeight():
     trackToDistvsHeight(trackcsvfile)
     outname = trackcsvfile.replace('.csv','_dist_alt.png')
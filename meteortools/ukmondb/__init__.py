@@ -10,9 +10,20 @@ trajPickle      get a WMPL pickle object for a trajectory
 apiExampleCode  various examples of how to use the APIs  
 """
 
-from .ECSVhandler import getECSVs
-from .getMatches import getMatchesForDate, getDetailsOfMatch, getDetailOfMatchList
-from .getLiveImages import getLiveJpgs, getFBfiles, createTxtFile, getLiveimageList
-from .trajectoryKML import trajectoryKML
-from .trajPickle import getTrajPickle
-from .getDetections import getDetections
+try:
+    from ..utils.lazyImport import lazyPackage
+except Exception:
+    from meteortools.utils.lazyImport import lazyPackage
+
+# the submodules are only imported when one of their functions is first used, so importing the
+# package does not load libraries that are not needed
+_submodules = {
+    'ECSVhandler': ['getECSVs'],
+    'getMatches': ['getMatchesForDate', 'getDetailsOfMatch', 'getDetailOfMatchList'],
+    'getLiveImages': ['getLiveJpgs', 'getFBfiles', 'createTxtFile', 'getLiveimageList'],
+    'trajectoryKML': ['trajectoryKML'],
+    'trajPickle': ['getTrajPickle'],
+    'getDetections': ['getDetections'],
+}
+__all__ = [name for names in _submodules.values() for name in names]
+__getattr__, __dir__ = lazyPackage(__name__, {name: mod for mod, names in _submodules.items() for name in names})
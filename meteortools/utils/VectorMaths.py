@@ -9,7 +9,7 @@ def shortestDistance(a, b, c, d):
     # Lines are L=a+bt, M=c+ds
     e = a - c
     b2 = np.dot(b, b)
-    d2 = np.dot(b, b)
+    d2 = np.dot(d, d)
     bd = np.dot(b, d)
     de = np.dot(d, e)
     be = np.dot(b, e)
@@ -22,3 +22,55 @@ def shortestDistance(a, b, c, d):
     d = math.sqrt(np.dot(D, D))
 
     return s, t, d
+
+
+def shortestDistanceBatch(A, B, C, D, allpairs=False, threshold=None, eps=1e-12):
+    """ Closest approach between many pairs of lines L=A+Bt and M=C+Ds.  
+
+    Arguments:  
+        A: [array] (N,3) points on the first lines  
+        B: [array] (N,3) directions of the first lines  
+        C: [array] (N,3) or (M,3) points on the second lines  
+        D: [array] (N,3) or (M,3) directions of the second lines  
+
+    Keyword arguments:  
+        allpairs: [bool] if True, compare every first line with every second line, giving (N,M) results.  
+            Otherwise line i is compared with line i, giving (N,) results. Default False.  
+        threshold: [float] if set, only return the pairs whose miss distance is at most this.  
+        eps: [float] lines are treated as parallel if the squared sine of the angle between them is less 
+            than this. The distance is then measured from C to the first line, with s=0.  
+
+    Returns:  
+        (s, t, dist): arrays of the parameters along M and L of the closest points, and the miss distance.  
+        If threshold is set, returns (i, j, s, t, dist) for just the close pairs, where i and j are the 
+        indices of the first and second lines.  
+    """
+    A, B, C, D = [np.atleast_2d(np.asarray(x, dtype=np.float64)) for x in (A, B, C, D)]
+    if allpairs:
+        A, B = A[:, np.newaxis, :], B[:, np.newaxis, :]
+        C, D = C[np.newaxis, :, :], D[np.newaxis, :, :]
+
+    E = A - C
+    b2 = np.sum(B*B, axis=-1)
+    d2 = np.sum(D*D, axis=-1)
+    bd = np.sum(B*D, axis=-1)
+    de = np.sum(D*E, axis=-1)
+    be = np.sum(B*E, axis=-1)
+
+    den = -b2 * d2 + bd * bd
+    parallel = np.abs(den) <= eps * b2 * d2
+    den = np.where(parallel, 1.0, den)
+    s = np.where(parallel, 0.0, (-b2 * de + be * bd) / den)
+    t = np.where(parallel, -be / b2, (+d2 * be - de * bd) / den)
+    V = E + B * t[..., np.newaxis] - D * s[..., np.newaxis]
+    dist = np.sqrt(np.sum(V*V, axis=-1))
+
+    if threshold is None:
+        return s, t, dist
+
+    close = dist <= threshold
+    if allpairs:
+        i, j = np.nonzero(close)
+    else:
+        i = j = np.nonzero(close)[0]
+    return i, j, s[close], t[close], dist[close]
@@ -4,7 +4,10 @@
 Utility functions used across the UKMON toolset
 
 List of Functions:  
-jd2Date, date2JD, datetime2JD, jd2DynamicalTimeJD, jd2LST, sollon2jd  
+jd2Date, date2JD, datetime2JD, jd2DynamicalTimeJD, jd2LST, sollon2jd, jd2sollon  
+datetime64ToJD, jdToDatetime64  
+SiderealTimeCache, siderealTimeCache, LEAP_SECONDS  
+equatorialCoordPrecessionBatch, precessionMatrix  
 
 greatCircleDistance, angleBetweenSphericalCoords, calcApparentSiderealEarthRotation   
 calcNutationComponents, equatorialCoordPrecession,  raDec2AltAz, altAz2RADec  
@@ -12,25 +15,46 @@ altAz2RADec_vect, raDec2AltAz_vect, equatorialCoordPrecession_vect
 
 annotateImage, annotateImageArbitrary  
 
-getActiveShowers, getActiveShowersStr, getShowerDets, getShowerPeak  
+getActiveShowers, getActiveShowersStr, getActiveShowersForDates, getShowerDets, getShowerPeak  
 
 sendAnEmail, forwardAnEmail
 
 getNextRiseSet
 
+GeoIndex
+
+associateShowers
+
+FovStore, getOverlapGraph
+
+getCacheDir
+
 """
-from .Math import jd2Date, date2JD,datetime2JD, jd2DynamicalTimeJD, JULIAN_EPOCH, J2000_JD, jd2LST
-from .Math import greatCircleDistance, angleBetweenSphericalCoords, calcApparentSiderealEarthRotation
-from .Math import calcNutationComponents, equatorialCoordPrecession,  raDec2AltAz, altAz2RADec
-from .Math import altAz2RADec_vect, raDec2AltAz_vect, equatorialCoordPrecession_vect
-from .annotateImage import annotateImage, annotateImageArbitrary
-from .convertSolLon import sollon2jd
-from .getActiveShowers import getActiveShowers, getActiveShowersStr
-from .getShowerDates import getShowerDets, getShowerPeak, numpifyShowerData
-from .sendAnEmail import sendAnEmail, forwardAnEmail
-from .drawFTPfile import drawFTPFile
-from .plotTrack import trackToDistvsHeight, trackToTimevsVelocity, trackToTimevsHeight
-from .getOverlappingFovs import checkKMLOverlap, pointInsideFov, getOverlapWith, getOverlappingCameras
-from .getRiseSet import getNextRiseSet
+from .lazyImport import lazyPackage
+
+# the submodules are only imported when one of their functions is first used, so importing the
+# package does not load libraries that are not needed
+_submodules = {
+    'Math': ['jd2Date', 'date2JD', 'datetime2JD', 'jd2DynamicalTimeJD', 'JULIAN_EPOCH', 'J2000_JD', 'jd2LST',
+        'greatCircleDistance', 'angleBetweenSphericalCoords', 'calcApparentSiderealEarthRotation',
+        'calcNutationComponents', 'equatorialCoordPrecession', 'raDec2AltAz', 'altAz2RADec', 'altAz2RADec_vect',
+        'raDec2AltAz_vect', 'equatorialCoordPrecession_vect', 'datetime64ToJD', 'jdToDatetime64', 'SiderealTimeCache',
+        'siderealTimeCache', 'LEAP_SECONDS', 'equatorialCoordPrecessionBatch', 'precessionMatrix'],
+    'annotateImage': ['annotateImage', 'annotateImageArbitrary'],
+    'convertSolLon': ['sollon2jd', 'jd2sollon'],
+    'getActiveShowers': ['getActiveShowers', 'getActiveShowersStr', 'getActiveShowersForDates'],
+    'getShowerDates': ['getShowerDets', 'getShowerPeak', 'numpifyShowerData'],
+    'sendAnEmail': ['sendAnEmail', 'forwardAnEmail'],
+    'drawFTPfile': ['drawFTPFile'],
+    'plotTrack': ['trackToDistvsHeight', 'trackToTimevsVelocity', 'trackToTimevsHeight'],
+    'getOverlappingFovs': ['checkKMLOverlap', 'pointInsideFov', 'getOverlapWith', 'getOverlappingCameras', 'getOverlapGraph',
+        'FovStore'],
+    'getRiseSet': ['getNextRiseSet'],
+    'geoIndex': ['GeoIndex'],
+    'associateShowers': ['associateShowers'],
+    'cacheDir': ['getCacheDir'],
+}
+__all__ = [name for names in _submodules.values() for name in names]
+__getattr__, __dir__ = lazyPackage(__name__, {name: mod for mod, names in _submodules.items() for name in names})
 
 #from .findNearDuplicates import findNearDuplicates
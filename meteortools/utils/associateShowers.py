@@ -0,0 +1,127 @@
+# Copyright (C) 2018-2023 Mark McIntyre
+#
+# associate meteor orbits with showers using the GMN shower table
+
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .Math import angleBetweenSphericalCoords
+except Exception:
+    from meteortools.utils.Math import angleBetweenSphericalCoords
+
+
+def associateShowers(df, solcol='_sol', lngcol='_elng', latcol='_elat', vgcol='_vg',
+                     sollonwindow=0.1, vgtolerance=0.1, chunksize=10000, streamfile=None):
+    """ Associate each meteor in a table of orbits with a shower from the GMN shower table. A meteor  
+    matches a table entry if the solar longitudes are within the window, the radiants are within the  
+    entry's dispersion, and the geocentric velocities agree to within the tolerance. If more than one  
+    entry matches, the one with the closest radiant is used. The meteors are processed in chunks, so  
+    large tables can be associated without running out of memory.  
+
+    Arguments:  
+        df: [DataFrame] the orbits, for example a UKMON monthly matches file  
+
+    Keyword arguments:  
+        solcol: [str] solar longitude column in degrees. Default '_sol'  
+        lngcol: [str] geocentric ecliptic longitude column of the radiant in degrees. Default '_elng'  
+        latcol: [str] geocentric ecliptic latitude column of the radiant in degrees. Default '_elat'  
+        vgcol: [str] geocentric velocity column in km/s. Default '_vg'  
+        sollonwindow: [float] solar longitude window in degrees, at most 1. Default 0.1, half the table spacing.  
+        vgtolerance: [float] allowed fractional difference in geocentric velocity. Default 0.1, ie 10%.  
+        chunksize: [int] number of meteors to process at once. Default 10000.  
+        streamfile: [str] the IAU stream data file used to look up shower codes. Default None, the bundled file.  
+
+    Returns:  
+        a DataFrame with the same index as df and columns shower (the IAU code, or 'spo'), iau_no (-1 for  
+        sporadics), rad_dist (radiant distance in degrees) and vg_diff (velocity difference in km/s)  
+    """
+    if not 0 <= sollonwindow <= 1:
+        raise ValueError('sollonwindow must be between 0 and 1 degree')
+    table = _gmnShowerTable()
+    codes = _iauShowerCodes(streamfile)
+
+    sol = np.radians(df[solcol].to_numpy(dtype=np.float64)) % (2*np.pi)
+    # the table uses sun-centred ecliptic longitudes
+    lng = np.radians(df[lngcol].to_numpy(dtype=np.float64)) - sol
+    lat = np.radians(df[latcol].to_numpy(dtype=np.float64))
+    vg = df[vgcol].to_numpy(dtype=np.float64) * 1000
+
+    n = len(sol)
+    best = np.full(n, -1, dtype=np.intp)
+    bestdist = np.full(n, np.nan)
+    window = np.radians(sollonwindow)
+    for start in range(0, n, chunksize):
+        end = min(start + chunksize, n)
+        # the meteor/table pairs within the solar longitude window. The table is sorted by solar longitude
+        # and repeated either side of 0/360, so each meteor's candidates are a contiguous slice
+        lo = np.searchsorted(table[:,0], sol[start:end] - window, side='left')
+        hi = np.searchsorted(table[:,0], sol[start:end] + window, side='right')
+        counts = np.where(np.isnan(sol[start:end]), 0, hi - lo)
+        mi = np.repeat(np.arange(start, end), counts)
+        ti = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        dist = angleBetweenSphericalCoords(lat[mi], lng[mi], table[ti,2], table[ti,1])
+        ok = (dist <= table[ti,4]) & (np.abs(vg[mi] - table[ti,3]) <= vgtolerance * table[ti,3])
+        mi, ti, dist = mi[ok], ti[ok], dist[ok]
+
+        # keep the closest match for each meteor
+        order = np.lexsort((dist, mi))
+        mi, ti, dist = mi[order], ti[order], dist[order]
+        first = np.unique(mi, return_index=True)[1]
+        best[mi[first]] = ti[first]
+        bestdist[mi[first]] = dist[first]
+
+    matched = best >= 0
+    iau_no = np.full(n, -1, dtype=int)
+    iau_no[matched] = table[best[matched], 5].astype(int)
+    vg_diff = np.full(n, np.nan)
+    vg_diff[matched] = (vg[matched] - table[best[matched], 3]) / 1000
+    shower = np.array([codes.get(no, f'{no:03d}') if no >= 0 else 'spo' for no in iau_no], dtype=object)
+    return pd.DataFrame({'shower': shower, 'iau_no': iau_no, 'rad_dist': np.degrees(bestdist),
+                         'vg_diff': vg_diff}, index=df.index)
+
+
+def _shareFile(fname):
+    """ Internal function to find a data file, in $DATADIR/share if present, otherwise the bundled copy """
+    datadir = os.getenv('DATADIR', default='/home/ec2-user/prod/data')
+    fullname = os.path.join(datadir, 'share', fname)
+    if not os.path.isfile(fullname):
+        datadir = os.path.split(os.path.abspath(__file__))[0]
+        fullname = os.path.join(datadir, '..', 'share', fname)
+    return fullname
+
+
+@lru_cache(maxsize=None)
+def _gmnShowerTable():
+    """ Internal function to load the GMN shower table, sorted by solar longitude, with the entries
+    within a degree of 0/360 repeated at the other end so that windows can wrap around
+    """
+    table = np.load(_shareFile('gmn_shower_table_20230518.npy'))
+    table = table[np.argsort(table[:,0], kind='stable')]
+    edge = np.radians(1)
+    before = table[table[:,0] >= 2*np.pi - edge].copy()
+    before[:,0] -= 2*np.pi
+    after = table[table[:,0] <= edge].copy()
+    after[:,0] += 2*np.pi
+    table = np.concatenate((before, table, after))
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=None)
+def _iauShowerCodes(streamfile=None):
+    """ Internal function to map IAU shower numbers to codes using the IAU stream data """
+    if streamfile is None:
+        streamfile = _shareFile('streamfulldata.npy')
+    streams = np.load(streamfile)
+    codes = {}
+    for no, code in zip(streams[:,1], streams[:,3]):
+        try:
+            codes.setdefault(int(no), code.strip())
+        except ValueError:
+            continue
+    return codes
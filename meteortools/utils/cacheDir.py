@@ -0,0 +1,20 @@
+# Copyright (C) 2018-2023 Mark McIntyre
+#
+# location of the per-user cache used for parsed data files
+
+import os
+
+
+def getCacheDir():
+    """ Get the folder used to cache parsed data files, creating it if needed. This is $METEORTOOLS_CACHE  
+    if set, otherwise meteortools in the user's cache folder ($XDG_CACHE_HOME or ~/.cache).  
+
+    Returns:  
+        full path to the folder  
+    """
+    cachedir = os.getenv('METEORTOOLS_CACHE')
+    if not cachedir:
+        basedir = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        cachedir = os.path.join(basedir, 'meteortools')
+    os.makedirs(cachedir, exist_ok=True)
+    return cachedir
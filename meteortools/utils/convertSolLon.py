@@ -1,10 +1,11 @@
 # Copyright (C) 2018-2023 Mark McIntyre
 #
 import numpy as np
+from functools import lru_cache
 try:
-    from ..utils import date2JD
+    from ..utils import datetime64ToJD
 except Exception:
-    from meteortools.utils import date2JD
+    from meteortools.utils import datetime64ToJD
 
 
 def sollon2jd(Year, Month, Long):
@@ -14,31 +15,96 @@ def sollon2jd(Year, Month, Long):
     of a given LS varies from year to year.  
 
     Parameters:  
-        Year: [int] year you wish to calculate in.  
-        Month: [int] month you wish to calculate in.  
-        Long:  [float] The solar longitude to convert.   
+        Year: [int or array] year you wish to calculate in.  
+        Month: [int or array] month you wish to calculate in.  
+        Long:  [float or array] The solar longitude to convert.   
 
     Returns:  
-        [float] julian date  
+        [float or array] julian date  
 
     Notes:  
         The function is only stable for date ranges from 1900-2100.  
+        The arguments may be numpy arrays, which are broadcast against each other.  
     """
+    scalar = np.ndim(Year) == 0 and np.ndim(Month) == 0 and np.ndim(Long) == 0
+    Year = np.asarray(Year, dtype=np.int64)
+    Month = np.asarray(Month, dtype=np.int64)
 
     Long = np.radians(Long)
     N = Year - 2000
-    if abs(N) > 100:
+    if np.any(np.abs(N) > 100):
         print("Algorithm is not stable for years below 1900 or above 2100")
 
     JDM0 = 2451182.24736 + 365.25963575 * N
-    ApproxJD = date2JD(Year, Month, 15, 12, 0, 0)
+
+    # julian date of noon on the 15th of the month
+    mth = ((Year - 1970) * 12 + Month - 1).astype('datetime64[M]')
+    ApproxJD = datetime64ToJD(mth + np.timedelta64(14, 'D') + np.timedelta64(12, 'h'))
     DiffJD = ApproxJD-2451545
 
     Dt = 1.94330 * np.sin(Long - 1.798135) + 0.01305272 * np.sin(2*Long + 2.634232) + 78.195268 + 58.13165 * Long - 0.0000089408 * DiffJD
 
-    if abs(ApproxJD - (JDM0 + Dt))>50:
-        Dt = Dt + 365.2596
+    Dt = np.where(np.abs(ApproxJD - (JDM0 + Dt))>50, Dt + 365.2596, Dt)
 
     JD1 = JDM0 + Dt
 
+    if scalar:
+        return float(JD1)
     return JD1
+
+
+def jd2sollon(jd):
+    """
+    Calculate the solar longitude corresponding to a julian date. This is the inverse of sollon2jd, 
+    and uses a precomputed table of julian date against solar longitude for each year so that an 
+    array of dates is converted with a single interpolation.  
+
+    Parameters:  
+        jd: [float or array] julian date(s)  
+
+    Returns:  
+        [float or array] solar longitude in degrees, in the range 0 to 360  
+
+    Notes:  
+        The function is only stable for date ranges from 1900-2100.  
+    """
+    jds = np.asarray(jd, dtype=np.float64)
+    nmin, nmax = _DEFAULT_YEARS
+    if jds.size > 0 and np.any(np.isfinite(jds)):
+        ns = np.floor((jds[np.isfinite(jds)] - _EQUINOX0)/_YEAR_LEN)
+        if ns.min() < nmin or ns.max() > nmax:
+            nmin, nmax = int(min(ns.min(), nmin)), int(max(ns.max(), nmax))
+            print("Algorithm is not stable for years below 1900 or above 2100")
+    jdtable, lontable = _sollonTable(nmin, nmax)
+    sollon = np.interp(jds, jdtable, lontable) % 360
+    sollon = np.where(np.isnan(jds), np.nan, sollon)
+    if np.ndim(jd) == 0:
+        return float(sollon)
+    return sollon
+
+
+# the formula in sollon2jd counts years from the equinox before this date
+_EQUINOX0 = 2451182.24736 + 76.3
+_YEAR_LEN = 365.25963575
+_DEFAULT_YEARS = (-101, 101)
+_LUT_STEP = 0.25  # degrees
+
+
+@lru_cache(maxsize=4)
+def _sollonTable(nmin, nmax):
+    """ Internal function to build the table of julian date against unwrapped solar longitude, for the 
+    years from the equinox in 1999+nmin to the one after 1999+nmax. The julian dates increase 
+    monotonically, so the table can be used directly with np.interp.  
+    """
+    longs = np.arange(0, 360 + _LUT_STEP/2, _LUT_STEP)
+    lrad = np.radians(longs)
+    ns = np.arange(nmin, nmax + 1)
+    JDM0 = 2451182.24736 + 365.25963575 * ns[:, np.newaxis]
+    Dt = 1.94330 * np.sin(lrad - 1.798135) + 0.01305272 * np.sin(2*lrad + 2.634232) + 78.195268 + 58.13165 * lrad
+    # the secular term depends on the date itself, so estimate it from the date without it
+    DiffJD = JDM0 + Dt - 2451545
+    jdtable = (JDM0 + Dt - 0.0000089408 * DiffJD).ravel()
+    lontable = (longs + 360 * (ns[:, np.newaxis] - nmin)).ravel()
+    jdtable.flags.writeable = False
+    lontable.flags.writeable = False
+    return jdtable, lontable
@@ -0,0 +1,136 @@
+# Copyright (C) 2018-2023 Mark McIntyre
+#
+# spatial index for great-circle proximity queries on lat/lon data
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+try:
+    from .Math import greatCircleDistance
+except Exception:
+    from meteortools.utils.Math import greatCircleDistance
+
+EARTH_RADIUS = 6371.0  # km, the same value as used in greatCircleDistance
+
+
+class GeoIndex(object):
+    """ Spatial index over a set of latitudes and longitudes, for "which points are within X km of here"  
+    and "which are the nearest K points to here" queries. The points are stored as unit vectors in a  
+    KD-tree, so great-circle distances become straight-line chord lengths. Build it once, then query it  
+    as often as needed.  
+
+    Arguments:  
+        lats: [array] latitudes in degrees  
+        lons: [array] longitudes in degrees (+E)  
+
+    Example:  
+        idx = GeoIndex.fromDataFrame(matches, '_lat2', '_lng2')  
+        nearby = matches.iloc[idx.withinRadius(51.88, -1.31, 100)]  
+    """
+    def __init__(self, lats, lons):
+        self.lats = np.asarray(lats, dtype=np.float64).ravel()
+        self.lons = np.asarray(lons, dtype=np.float64).ravel()
+        self.tree = cKDTree(_toUnitVectors(self.lats, self.lons))
+
+    @classmethod
+    def fromDataFrame(cls, df, latcol='lat', loncol='lon'):
+        """ Create an index from two columns of a pandas DataFrame. Query results are row positions,  
+        suitable for use with df.iloc.  
+
+        Arguments:  
+            df: [DataFrame] the data to index  
+
+        Keyword arguments:  
+            latcol: [str] name of the latitude column, in degrees. Default 'lat'  
+            loncol: [str] name of the longitude column, in degrees. Default 'lon'  
+        """
+        return cls(df[latcol].to_numpy(dtype=np.float64), df[loncol].to_numpy(dtype=np.float64))
+
+    def __len__(self):
+        return len(self.lats)
+
+    def withinRadius(self, lat, lon, radius):
+        """ Find the points within a given great-circle distance of a location  
+
+        Arguments:  
+            lat: [float] latitude in degrees  
+            lon: [float] longitude in degrees  
+            radius: [float] distance in km  
+
+        Returns:  
+            [array] sorted positions of the points that are within the radius  
+        """
+        vec = _toUnitVectors(lat, lon)[0]
+        return np.array(sorted(self.tree.query_ball_point(vec, _kmToChord(radius))), dtype=np.intp)
+
+    def withinRadiusBatch(self, lats, lons, radius):
+        """ Find the points within a given great-circle distance of each of many locations  
+
+        Arguments:  
+            lats: [array] latitudes in degrees  
+            lons: [array] longitudes in degrees  
+            radius: [float or array] distance in km, either one for all locations or one per location  
+
+        Returns:  
+            [list of arrays] sorted positions of the points within the radius of each location  
+        """
+        vecs = _toUnitVectors(lats, lons)
+        chords = np.broadcast_to(_kmToChord(radius), (len(vecs),))
+        res = self.tree.query_ball_point(vecs, chords)
+        return [np.array(sorted(r), dtype=np.intp) for r in res]
+
+    def nearest(self, lat, lon, k=1):
+        """ Find the k nearest points to one or many locations  
+
+        Arguments:  
+            lat: [float or array] latitude in degrees  
+            lon: [float or array] longitude in degrees  
+
+        Keyword arguments:  
+            k: [int] number of points to return. Default 1.  
+
+        Returns:  
+            (dists, idx): distances in km and positions of the nearest points, closest first. For a single  
+            location these are arrays of length k, for many locations they have shape (n, k).  
+        """
+        vecs = _toUnitVectors(lat, lon)
+        k = min(k, len(self))
+        chords, idx = self.tree.query(vecs, k=k)
+        chords = np.asarray(chords).reshape(len(vecs), k)
+        idx = np.asarray(idx).reshape(len(vecs), k)
+        dists = _chordToKm(chords)
+        if np.ndim(lat) == 0:
+            return dists[0], idx[0]
+        return dists, idx
+
+    def distances(self, lat, lon):
+        """ Great-circle distance in km from a location to every point in the index  
+
+        Arguments:  
+            lat: [float] latitude in degrees  
+            lon: [float] longitude in degrees  
+
+        Returns:  
+            [array] distances in km  
+        """
+        return greatCircleDistance(np.radians(lat), np.radians(lon), np.radians(self.lats), np.radians(self.lons))
+
+
+def _toUnitVectors(lats, lons):
+    """ Internal function to convert latitudes and longitudes in degrees to an (n,3) array of unit vectors """
+    lats = np.radians(np.atleast_1d(np.asarray(lats, dtype=np.float64)).ravel())
+    lons = np.radians(np.atleast_1d(np.asarray(lons, dtype=np.float64)).ravel())
+    coslat = np.cos(lats)
+    return np.column_stack((coslat*np.cos(lons), coslat*np.sin(lons), np.sin(lats)))
+
+
+def _kmToChord(dist):
+    """ Internal function to convert a great-circle distance to the chord length on a unit sphere """
+    angle = np.minimum(np.asarray(dist, dtype=np.float64)/EARTH_RADIUS, np.pi)
+    # the tree compares chords with <=, so allow for rounding when points are exactly on the radius
+    return 2*np.sin(angle/2) * (1 + 1e-12)
+
+
+def _chordToKm(chord):
+    """ Internal function to convert a chord length on a unit sphere to a great-circle distance """
+    return 2*EARTH_RADIUS*np.arcsin(np.minimum(chord/2, 1.0))
@@ -25,7 +25,7 @@ def getActiveShowers(targdate, retlist=False, inclMinor=False):
         If retlist is true, returns a python list of shower short-codes eg ['PER','LYR']  
 
     """
-    sl = iwsl.IMOshowerList()
+    sl = iwsl.getIMOshowerList()
     testdate = datetime.datetime.strptime(targdate, '%Y%m%d')
     listofshowers=sl.getActiveShowers(testdate, True, inclMinor=inclMinor)
     if retlist is False:
@@ -35,6 +35,25 @@ def getActiveShowers(targdate, retlist=False, inclMinor=False):
         return listofshowers
 
 
+def getActiveShowersForDates(targdates, inclMinor=False):
+    """
+    Return the showers active on each of a list of dates  
+
+    Arguments:  
+        targdates:  [list] Dates in YYYYMMDD format, or a list or array of datetimes  
+
+    Keyword Arguments:  
+        inclMinor:  [bool] include minor showers or only return major showers  
+
+    Returns:  
+        A python list with a list of shower short-codes for each date eg [['PER','KCG'], ['PER']]  
+
+    """
+    sl = iwsl.getIMOshowerList()
+    testdates = [datetime.datetime.strptime(d, '%Y%m%d') if isinstance(d, str) else d for d in targdates]
+    return sl.getActiveShowersForDates(testdates, True, inclMinor=inclMinor)
+
+
 def getActiveShowersStr(targdatestr):
     """
     Prints a comma-separated list of showers active at the specified date  
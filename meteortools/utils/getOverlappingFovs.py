@@ -3,10 +3,20 @@
 #
 import os
 import glob
+import hashlib
+import pickle
 import xmltodict
 
+from shapely import wkb
 from shapely.geometry import Polygon
 from shapely.geometry import Point
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+try:
+    from .cacheDir import getCacheDir
+except Exception:
+    from meteortools.utils.cacheDir import getCacheDir
 
 
 def _munchKML(kmlFilename):
@@ -73,23 +83,17 @@ def getOverlapWith(srcfolder, kmlpattern='*-25km.kml', refcam='UK0006'):
     Returns:  
         list of camera IDs that overlap with the target  
     """
-    kmllist = glob.glob1(srcfolder, kmlpattern)
-    currmatches=[]
     refkml = f'{refcam}{kmlpattern[1:]}'
-    currmatches.append(refcam[:6])
     print('checking ', refkml)
-    for testkml in kmllist:
-        if testkml != refkml:
-            testcam,_ = os.path.splitext(testkml)
-            if checkKMLOverlap(os.path.join(srcfolder, refkml), os.path.join(srcfolder, testkml)) is True:
-                currmatches.append(testcam[:6])
-    return currmatches
+    store = FovStore(srcfolder, kmlpattern)
+    return [refcam[:6]] + store.overlapsWith(store.cameras[store.kmlfiles.index(refkml)])
 
 
 
 def getOverlappingCameras(srcfolder, kmlpattern='*-25km.kml'):
     """
-    Check for all overlaps in the folder at the pattern altitude. Returns a massive 2d array  
+    Check for all overlaps in the folder at the pattern altitude. Returns a massive 2d array.  
+    See getOverlapGraph for the same information as a graph.  
 
     Arguments:  
         srcfolder:  [str] path to folder containing KML files to test.   
@@ -99,18 +103,141 @@ def getOverlappingCameras(srcfolder, kmlpattern='*-25km.kml'):
         list of lists of groups of overlaping IDs 
      
     """
-    kmllist = glob.glob1(srcfolder, kmlpattern)
-    kmllist2 = kmllist
-    matches = []
-
-    for refkml in kmllist:
-        currmatches=[]
-        refcam,_ = os.path.splitext(refkml)
-        currmatches.append(refcam[:6])
-        for testkml in kmllist2:
-            if testkml != refkml:
-                testcam,_ = os.path.splitext(testkml)
-                if checkKMLOverlap(os.path.join(srcfolder, refkml), os.path.join(srcfolder, testkml)) is True:
-                    currmatches.append(testcam[:6])
-        matches.append(currmatches)
-    return matches
+    store = FovStore(srcfolder, kmlpattern)
+    return [[cam] + store.overlapsWith(cam) for cam in store.cameras]
+
+
+def getOverlapGraph(srcfolder, kmlpattern='*-25km.kml'):
+    """
+    Find all the overlapping cameras in the folder at the pattern altitude, as a graph  
+
+    Arguments:  
+        srcfolder:  [str] path to folder containing KML files to test.   
+        kmlpattern: [str] kml pattern to match. Default "*-25km.kml"  
+
+    Returns:  
+        (graph, groups): graph is a dict of camera ID to the list of IDs it overlaps with, and groups is a  
+        list of the connected groups of cameras, largest first  
+    """
+    store = FovStore(srcfolder, kmlpattern)
+    return store.adjacency(), store.connectedComponents()
+
+
+class FovStore(object):
+    """ The fields of view of all the cameras in a folder at one altitude. Each KML file is parsed once,  
+    and the polygons are saved as WKB in a cache file so later runs only reparse the KML files that  
+    have changed. Overlaps are found with an STRtree of the polygons, so only cameras whose  
+    bounding boxes intersect are tested.  
+
+    Arguments:  
+        srcfolder:  [str] path to folder containing the KML files  
+
+    Keyword arguments:  
+        kmlpattern: [str] kml pattern to match. Default "*-25km.kml"  
+        cachefile:  [str] the cache file. Default None, a file for srcfolder in the user's cache folder,  
+                    see utils.getCacheDir. False disables the cache.  
+
+    Example:  
+        store = FovStore('/path/to/kmls', '*-70km.kml')  
+        graph = store.adjacency()  
+    """
+    def __init__(self, srcfolder, kmlpattern='*-25km.kml', cachefile=None):
+        self.srcfolder = srcfolder
+        if cachefile is None:
+            folderhash = hashlib.sha256(os.path.abspath(srcfolder).encode('utf-8')).hexdigest()[:16]
+            try:
+                cachefile = os.path.join(getCacheDir(), f'fovstore-{folderhash}.snap')
+            except OSError:
+                cachefile = False
+        self.cachefile = cachefile
+        self.kmlfiles = glob.glob1(srcfolder, kmlpattern)
+        self.cameras = [os.path.splitext(kml)[0][:6] for kml in self.kmlfiles]
+        self.polygons = self._loadPolygons()
+        self.tree = STRtree(self.polygons)
+        self.prepared = [prep(p) for p in self.polygons]
+        self._adjacency = None
+
+    def _loadPolygons(self):
+        """ Internal function to read the polygons from the cache, reparsing any KML files that are new  
+        or have been modified since the cache was written  
+        """
+        cache = {}
+        if self.cachefile:
+            try:
+                with open(self.cachefile, 'rb') as inf:
+                    cache = pickle.load(inf)
+            except Exception:
+                pass
+        polygons = []
+        changed = False
+        for kml in self.kmlfiles:
+            mtime = os.stat(os.path.join(self.srcfolder, kml)).st_mtime_ns
+            if kml in cache and cache[kml][0] == mtime:
+                polygons.append(wkb.loads(cache[kml][1]))
+            else:
+                _, polyg = _munchKML(os.path.join(self.srcfolder, kml))
+                polygons.append(polyg)
+                cache[kml] = (mtime, polyg.wkb)
+                changed = True
+        if changed and self.cachefile:
+            tmpname = None
+            try:
+                # write to a temporary file first so other processes never see a partial cache
+                tmpname = f'{self.cachefile}.{os.getpid()}'
+                with open(tmpname, 'wb') as outf:
+                    pickle.dump(cache, outf, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmpname, self.cachefile)
+            except Exception:
+                # the cache may not be writeable, in which case the KML files are parsed every time
+                if tmpname is not None and os.path.isfile(tmpname):
+                    os.remove(tmpname)
+        return polygons
+
+    def overlapsWith(self, camid):
+        """ Find the cameras whose fields of view overlap a camera's  
+
+        Arguments:  
+            camid: [str] the camera ID  
+
+        Returns:  
+            list of camera IDs that overlap with it, in the same order as self.cameras  
+        """
+        return self.adjacency()[camid]
+
+    def adjacency(self):
+        """ The overlap graph  
+
+        Returns:  
+            a dict of camera ID to the list of camera IDs whose fields of view overlap it  
+        """
+        if self._adjacency is None:
+            self._adjacency = {}
+            for i, cam in enumerate(self.cameras):
+                # the tree returns the polygons whose bounding boxes intersect, which are then tested exactly
+                cands = sorted(int(j) for j in self.tree.query(self.polygons[i]) if j != i)
+                self._adjacency[cam] = [self.cameras[j] for j in cands if self.prepared[i].intersects(self.polygons[j])]
+        return self._adjacency
+
+    def connectedComponents(self):
+        """ Groups of cameras that are linked by overlapping fields of view  
+
+        Returns:  
+            a list of sorted lists of camera IDs, largest group first  
+        """
+        graph = self.adjacency()
+        seen = set()
+        groups = []
+        for cam in self.cameras:
+            if cam in seen:
+                continue
+            seen.add(cam)
+            group, tocheck = [], [cam]
+            while tocheck:
+                curr = tocheck.pop()
+                group.append(curr)
+                for other in graph[curr]:
+                    if other not in seen:
+                        seen.add(other)
+                        tocheck.append(other)
+            groups.append(sorted(group))
+        return sorted(groups, key=len, reverse=True)
@@ -0,0 +1,58 @@
+# Copyright (C) 2018-2023 Mark McIntyre
+#
+# load a package's submodules only when something from them is first used
+
+import importlib
+import sys
+import types
+
+
+class _LazyPackage(types.ModuleType):
+    """ Module type for lazily loaded packages. When a submodule is loaded, the import system stores it as  
+    an attribute of the package. If the submodule has the same name as the function it exports, for example  
+    getActiveShowers, the function is stored instead, just as it was when the package imported everything.  
+    """
+    def __setattr__(self, name, value):
+        if isinstance(value, types.ModuleType) and self.__dict__.get('_lazyexports', {}).get(name) == name:
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+def lazyPackage(pkgname, exports):
+    """ Make a package import its submodules on first use rather than when the package is imported.  
+    Call this from the package's __init__.py and assign the results to __getattr__ and __dir__.  
+
+    Arguments:  
+        pkgname: [str] the package's __name__  
+        exports: [dict] maps each name the package exports to the submodule that defines it  
+
+    Returns:  
+        (__getattr__, __dir__) functions for the package  
+
+    Example:  
+        __getattr__, __dir__ = lazyPackage(__name__, {'jd2Date': 'Math', 'GeoIndex': 'geoIndex'})  
+    """
+    pkg = sys.modules[pkgname]
+
+    def __getattr__(name):
+        if name in exports:
+            value = getattr(importlib.import_module(f'.{exports[name]}', pkgname), name)
+        elif not name.startswith('__'):
+            # submodules are also loaded on first use, so pkg.Math works without importing pkg.Math first
+            try:
+                value = importlib.import_module(f'.{name}', pkgname)
+            except ModuleNotFoundError as e:
+                if e.name != f'{pkgname}.{name}':
+                    raise
+                raise AttributeError(f'module {pkgname!r} has no attribute {name!r}') from None
+        else:
+            raise AttributeError(f'module {pkgname!r} has no attribute {name!r}')
+        setattr(pkg, name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(pkg.__dict__) | set(exports))
+
+    pkg._lazyexports = exports
+    pkg.__class__ = _LazyPackage
+    return __getattr__, __dir__